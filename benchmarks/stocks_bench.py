@@ -0,0 +1,234 @@
+"""Drives /getstocks and /dgw with HTC widget request bodies against a yfinance stand-in.
+
+getquotes, getsymbol and getchart bodies are sent through the Flask test client
+(one request at a time, with memory allocated per request from tracemalloc) and
+over a real socket with concurrent clients (throughput and tail latency). Yahoo
+is replaced by benchmarks/yfinance_stub.py, with optional latency and failures:
+
+    python benchmarks/stocks_bench.py --requests 300 --concurrency 8 --latency 0.05 --failure-rate 0.02
+
+"cold" empties every stocks cache and store before each request; "warm" primes
+them once and measures the steady state.
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+
+import requests
+from werkzeug.serving import make_server
+
+from config import app
+import stocks.helpers
+import stocks.history
+import stocks.metadata
+import stocks.symbols
+
+# No background work while measuring, and nothing written to the real data directory
+stocks.helpers.periodic_quote_prefetch = lambda *args, **kwargs: None
+DATA_DIR = tempfile.mkdtemp(prefix="stocks-bench-")
+stocks.history.HISTORY_DIR = os.path.join(DATA_DIR, "history")
+stocks.metadata.METADATA_STORE_PATH = os.path.join(DATA_DIR, "symbols.db")
+
+import stocks.routes
+from yfinance_stub import FakeYahoo, SYMBOLS
+
+HEADER = ('<?xml version="1.0" encoding="utf-8"?><request devtype="HTC_Sense" deployver="2.1" '
+          'app="HTC Stocks" appver="2.1.0" api="finance" apiver="1.0.1" acknotification="0000">')
+WATCHLISTS = [
+    ["^DJI", "^IXIC", "^GSPC", "AAPL", "MSFT", "GOOG", "AMZN", "2330.TW", "2498.TW", "0700.HK", "7203.T", "SAP.DE", "BP.L", "EURUSD=X", "BTC-USD"],
+    ["^DJI", "AAPL", "NVDA", "TSLA", "META", "AMD", "INTC", "QCOM"],
+    ["2330.TW", "2317.TW", "2498.TW", "005930.KS", "6758.T", "9988.HK"],
+]
+PHRASES = ["a", "ap", "app", "appl", "apple", "micro", "taiwan", "htc", "bank", "s&p"]
+CHART_SYMBOLS = [s[0] for s in SYMBOLS[:12]]
+
+
+def body(query):
+    # Request bodies end with one extra byte that getstocks cuts off
+    return HEADER + query + "</request>\n"
+
+
+def getquotes(i):
+    symbols = "".join(f"<symbol>{s}</symbol>" for s in WATCHLISTS[i % len(WATCHLISTS)])
+    return body(f'<query id="0" timestamp="1760000000" type="getquotes"><list>{symbols}</list></query>')
+
+
+def getsymbol(i):
+    phrase = PHRASES[i % len(PHRASES)].replace("&", "&amp;")
+    return body(f'<query id="0" timestamp="1760000000" type="getsymbol"><phrase>{phrase}</phrase>'
+                f'<count>10</count><offset>{10 * (i // len(PHRASES) % 2)}</offset></query>')
+
+
+def getchart(chart_range):
+    def build(i):
+        return body(f'<query id="0" timestamp="1760000000" type="getchart">'
+                    f'<symbol>{CHART_SYMBOLS[i % len(CHART_SYMBOLS)]}</symbol><range>{chart_range}</range></query>')
+    return build
+
+
+SCENARIOS = [
+    ("getquotes /getstocks", "/getstocks", getquotes),
+    ("getquotes /dgw", "/dgw", getquotes),
+    ("getsymbol", "/getstocks", getsymbol),
+    ("getchart 1d", "/getstocks", getchart("1d")),
+    ("getchart 3m", "/dgw", getchart("3m")),
+    ("getchart 1y", "/getstocks", getchart("1y")),
+    ("getchart 5y", "/getstocks", getchart("5y")),
+]
+
+
+def clear_caches():
+    stocks.helpers._quote_cache.clear()
+    stocks.helpers._search_cache.clear()
+    stocks.helpers._symbol_index = stocks.symbols.SymbolIndex()
+    with stocks.helpers._quote_popularity_lock:
+        stocks.helpers._quote_popularity.clear()
+    stocks.metadata._metadata.clear()
+    # A fresh directory rather than deleting the old one, which requests in flight may still write to
+    stocks.history.HISTORY_DIR = tempfile.mkdtemp(prefix="history-", dir=DATA_DIR)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def prime(post, path, build):
+    # Enough requests to send every distinct body of a scenario at least once
+    for i in range(2 * len(PHRASES) * len(WATCHLISTS)):
+        post(path, build(i))
+
+
+def run_test_client(path, build, count, cold):
+    client = app.test_client()
+    if not cold:
+        prime(lambda p, b: client.post(p, data=b), path, build)
+    latencies, failures, allocated, peaks = [], 0, 0, 0
+    for i in range(count):
+        if cold:
+            clear_caches()
+        tracemalloc.start()
+        start = time.perf_counter()
+        response = client.post(path, data=build(i))
+        latencies.append(time.perf_counter() - start)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        allocated += current
+        peaks += peak
+        if response.status_code != 200:
+            failures += 1
+    return latencies, failures, allocated / count, peaks / count
+
+
+def run_socket(base_url, path, build, count, concurrency, cold):
+    if not cold:
+        with requests.Session() as session:
+            prime(lambda p, b: session.post(base_url + p, data=b), path, build)
+
+    latencies, failures = [], [0]
+    lock = threading.Lock()
+    position = [0]
+
+    def worker():
+        with requests.Session() as session:
+            while True:
+                with lock:
+                    if position[0] >= count:
+                        return
+                    i = position[0]
+                    position[0] += 1
+                if cold:
+                    # Approximate under concurrency: other requests may refill the caches
+                    clear_caches()
+                start = time.perf_counter()
+                response = session.post(base_url + path, data=build(i))
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    if response.status_code != 200:
+                        failures[0] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+    return latencies, count / wall, failures[0]
+
+
+def ms(seconds):
+    return f"{seconds * 1000:8.2f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and mode")
+    parser.add_argument("--concurrency", type=int, default=8, help="client threads for the socket run")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every stand-in Yahoo call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many more seconds, at random")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of stand-in Yahoo calls that fail")
+    parser.add_argument("--mode", choices=["cold", "warm", "both"], default="both")
+    parser.add_argument("--only", help="run scenarios whose name contains this text")
+    args = parser.parse_args()
+
+    stub = FakeYahoo(latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate).install()
+    stocks.metadata.load_metadata_store()
+    # Handlers print every request type and upstream failure
+    sys.stdout = open(os.devnull, "w")
+    out = sys.__stdout__
+
+    # Injected failures surface as logged 500s, which are counted instead
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    app.logger.setLevel(logging.CRITICAL)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    modes = ["cold", "warm"] if args.mode == "both" else [args.mode]
+    scenarios = [s for s in SCENARIOS if not args.only or args.only in s[0]]
+
+    print(f"{args.requests} requests per run, {args.concurrency} socket clients, Yahoo latency "
+          f"{args.latency * 1000:.0f}+{args.jitter * 1000:.0f} ms, failure rate {args.failure_rate:.0%}", file=out)
+    print(file=out)
+    print("Test client (sequential), latency percentiles in ms, memory per request under tracemalloc in KiB", file=out)
+    print(f"{'scenario':<22}{'mode':<6}{'p50':>9}{'p95':>9}{'p99':>9}{'kept':>9}{'peak':>9}{'fail':>6}", file=out)
+    for name, path, build in scenarios:
+        for mode in modes:
+            latencies, failures, kept, peak = run_test_client(path, build, args.requests, mode == "cold")
+            print(f"{name:<22}{mode:<6}{ms(percentile(latencies, 50)):>9}{ms(percentile(latencies, 95)):>9}"
+                  f"{ms(percentile(latencies, 99)):>9}{kept / 1024:9.1f}{peak / 1024:9.1f}{failures:>6}", file=out)
+
+    print(file=out)
+    print(f"Socket ({args.concurrency} concurrent clients), throughput in req/s and latency percentiles in ms", file=out)
+    print(f"{'scenario':<22}{'mode':<6}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'fail':>6}", file=out)
+    for name, path, build in scenarios:
+        for mode in modes:
+            latencies, throughput, failures = run_socket(base_url, path, build, args.requests, args.concurrency, mode == "cold")
+            print(f"{name:<22}{mode:<6}{throughput:9.1f}{ms(percentile(latencies, 50)):>9}"
+                  f"{ms(percentile(latencies, 95)):>9}{ms(percentile(latencies, 99)):>9}{failures:>6}", file=out)
+
+    print(file=out)
+    print(f"Stand-in Yahoo calls: {stub.calls}", file=out)
+    server.shutdown()
+    stub.uninstall()
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
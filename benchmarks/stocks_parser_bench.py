@@ -0,0 +1,78 @@
+"""Compares the streaming stocks request parser with the ElementTree one.
+
+Both parsers run over realistic getquotes, getsymbol and getchart bodies as the
+HTC stocks widget sends them; time and peak memory per parse are reported:
+
+    python benchmarks/stocks_parser_bench.py --repeat 20000
+"""
+import argparse
+import os
+import sys
+import timeit
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import stocks.helpers
+
+HEADER = ('<?xml version="1.0" encoding="utf-8"?><request devtype="HTC_Sense" deployver="2.1" '
+          'app="HTC Stocks" appver="2.1.0" api="finance" apiver="1.0.1" acknotification="0000">')
+WATCHLIST = ["^DJI", "^IXIC", "^GSPC", "AAPL", "MSFT", "GOOG", "AMZN", "2330.TW", "2498.TW",
+             "0700.HK", "7203.T", "SAP.DE", "BP.L", "EURUSD=X", "BTC-USD"]
+
+
+def body(query):
+    # Request bodies end with one extra byte that getstocks cuts off
+    return (HEADER + query + "</request>\n").encode("utf-8")
+
+
+PAYLOADS = {
+    "getquotes (15 symbols)": body('<query id="0" timestamp="1760000000" type="getquotes"><list>'
+                                   + "".join(f"<symbol>{s}</symbol>" for s in WATCHLIST) + "</list></query>"),
+    "getquotes (50 symbols)": body('<query id="0" timestamp="1760000000" type="getquotes"><list>'
+                                   + "".join(f"<symbol>{s}</symbol>" for s in (WATCHLIST * 4)[:50]) + "</list></query>"),
+    "getsymbol": body('<query id="0" timestamp="1760000000" type="getsymbol">'
+                      '<phrase>apple</phrase><count>20</count><offset>0</offset></query>'),
+    "getchart": body('<query id="0" timestamp="1760000000" type="getchart">'
+                     '<symbol>2330.TW</symbol><range>1y</range></query>'),
+}
+
+
+def request_to_dict(payload):
+    # What getstocks did before parse_query
+    return stocks.helpers.request_to_dict(payload.decode("utf-8")[:-1])
+
+
+def parse_query(payload):
+    return stocks.helpers.parse_query(payload[:-1])
+
+
+def peak_memory(func, payload):
+    # Highest memory use while parsing, above what was allocated before the call
+    func(payload)
+    tracemalloc.start()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    func(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak - current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20000, help="parses per payload and parser")
+    args = parser.parse_args()
+
+    print(f"{'payload':<24}{'parser':<17}{'us/parse':>10}{'peak KiB':>10}")
+    for name, payload in PAYLOADS.items():
+        for label, func in (("request_to_dict", request_to_dict), ("parse_query", parse_query)):
+            seconds = min(timeit.repeat(lambda: func(payload), number=args.repeat, repeat=3)) / args.repeat
+            peak = peak_memory(func, payload)
+            print(f"{name:<24}{label:<17}{seconds * 1e6:10.2f}{peak / 1024:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Compares the direct stock response writers with rendering the Jinja templates.
+
+Checks first that both produce the same bytes (including names that need
+escaping), then times a 15-symbol watchlist, a page of search results and
+charts of several lengths:
+
+    python benchmarks/stocks_serializer_bench.py --repeat 2000
+"""
+import argparse
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import numpy as np
+from flask import render_template
+
+from config import app
+import stocks.charts
+import stocks.serializers
+
+NAMES = ["Apple Inc.", "AT&T Inc.", "Procter & Gamble Company (The)", "Taiwan Semiconductor <TSMC>",
+         "L'Oreal S.A.", 'Dow Jones "Industrial" Average', "Microsoft Corporation", None]
+
+
+def sample_quotes(count):
+    quotes = []
+    for i in range(count):
+        symbol = f"SYM{i}"
+        quotes.append({
+            'name': NAMES[i % len(NAMES)],
+            'symbol': symbol,
+            'timestamp': 1760000000.0 + i,
+            'link': f"https://finance.yahoo.com/quote/{symbol}",
+            'price': f"{100 + i * 1.37:.2f}",
+            'change': {'value': f"{(i - 7) * 0.31:+.2f}", 'percent': f"{(i - 7) * 0.12:+.2f}"},
+            'open': f"{99 + i:.2f}",
+            'high': "N/A" if i % 5 == 0 else f"{101 + i:.2f}",
+            'low': f"{98 + i:.2f}",
+            'volume': 1000000 + i * 7919
+        })
+    return quotes
+
+
+def sample_symbols(count):
+    return [{'name': NAMES[i % len(NAMES)], 'symbol': f"SYM{i}.TW"} for i in range(count)]
+
+
+def sample_chart(count):
+    bars = np.empty(count, dtype=[("ts", "<i8"), ("close", "<f8")])
+    bars["ts"] = 1600000000 + np.arange(count) * 86400
+    bars["close"] = 100 + np.cumsum(np.sin(np.arange(count)))
+    closes, timestamps = stocks.charts.chart_points(bars)
+    symbol = {'name': "AT&T Inc.", 'marketopen': 1760016600, 'marketclose': 1760040000,
+              'gmtoffset': -14400, 'application_data': '\\Application Data\\HTC\\ygo\\'}
+    return symbol, closes, timestamps
+
+
+def cases():
+    quotes = sample_quotes(15)
+    symbols = sample_symbols(20)
+    yield ("getquotes, 15 quotes",
+           lambda: render_template("stockquotes.xml", quotes=quotes),
+           lambda: stocks.serializers.quotes_xml(quotes))
+    yield ("getsymbol, 20 results",
+           lambda: render_template("stocksymbols.xml", quotes=symbols),
+           lambda: stocks.serializers.symbols_xml(symbols))
+    for count in (300, 1300, 5000):
+        symbol, closes, timestamps = sample_chart(count)
+        yield (f"getchart, {count} points",
+               # The template needs one dict per point, built from the same columns
+               lambda: render_template("stockchart.xml", symbol=symbol,
+                                       points=[{'close': c, 'timestamp': t} for c, t in zip(closes, timestamps)]),
+               lambda: stocks.serializers.chart_xml(symbol, closes, timestamps))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000, help="renders per case and writer")
+    args = parser.parse_args()
+
+    with app.test_request_context():
+        print(f"{'case':<24}{'jinja us':>10}{'direct us':>11}{'speedup':>9}  identical")
+        for name, jinja, direct in cases():
+            identical = jinja().encode("utf-8") == direct().encode("utf-8")
+            number = max(1, args.repeat // 10) if "points" in name else args.repeat
+            jinja_time = min(timeit.repeat(jinja, number=number, repeat=3)) / number
+            direct_time = min(timeit.repeat(direct, number=number, repeat=3)) / number
+            print(f"{name:<24}{jinja_time * 1e6:10.1f}{direct_time * 1e6:11.1f}{jinja_time / direct_time:8.1f}x  {identical}")
+
+
+if __name__ == "__main__":
+    main()
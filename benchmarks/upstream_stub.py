@@ -0,0 +1,97 @@
+import json
+import math
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "weather")
+
+
+class WeatherFixtures:
+    # Synthetic Nominatim and Open-Meteo responses following the upstream schemas,
+    # one set per location.
+    # Requests are answered with the fixture of the nearest (or named) location.
+
+    def __init__(self, directory=FIXTURES_DIR):
+        # One directory per location: nominatim_reverse.json, nominatim_search.json,
+        # open_meteo_daily.json (no hourly data) and open_meteo_htc2.json
+        self.locations = {}
+        for name in sorted(os.listdir(directory)):
+            location_dir = os.path.join(directory, name)
+            if not os.path.isdir(location_dir):
+                continue
+            fixtures = self.locations[name] = {}
+            for fname in os.listdir(location_dir):
+                if fname.endswith(".json"):
+                    with open(os.path.join(location_dir, fname), encoding="utf-8") as f:
+                        fixtures[fname[:-5]] = f.read()
+        for name, fixtures in self.locations.items():
+            reverse = json.loads(fixtures["nominatim_reverse"])
+            fixtures["lat"] = float(reverse["lat"])
+            fixtures["lon"] = float(reverse["lon"])
+
+    def nearest(self, lat, lon):
+        return min(self.locations.values(), key=lambda f: math.hypot(f["lat"] - lat, f["lon"] - lon))
+
+    def named(self, query):
+        city = query.split(",")[0].strip().lower().replace(" ", "_")
+        return self.locations.get(city) or next(iter(self.locations.values()))
+
+    def respond(self, path, params):
+        if path.endswith("/reverse"):
+            return self.nearest(float(params["lat"][0]), float(params["lon"][0]))["nominatim_reverse"]
+        if path.endswith("/search"):
+            return self.named(params["q"][0])["nominatim_search"]
+        if path.endswith("/forecast"):
+            kind = "open_meteo_htc2" if "hourly" in params else "open_meteo_daily"
+            latitudes = params["latitude"][0].split(",")
+            longitudes = params["longitude"][0].split(",")
+            bodies = [self.nearest(float(lat), float(lon))[kind] for lat, lon in zip(latitudes, longitudes)]
+            return bodies[0] if len(bodies) == 1 else "[" + ",".join(bodies) + "]"
+        return None
+
+
+class UpstreamStub:
+    # Local HTTP server standing in for Nominatim and Open-Meteo
+
+    def __init__(self, fixtures=None, latency=0.0, host="127.0.0.1", port=0):
+        self.fixtures = fixtures or WeatherFixtures()
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                body = stub.fixtures.respond(url.path, parse_qs(url.query))
+                with stub._lock:
+                    stub.requests += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if body is None:
+                    self.send_error(404)
+                    return
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,265 @@
+"""Drives the weather routes against synthetic Nominatim and Open-Meteo responses.
+
+The responses in benchmarks/fixtures/weather were written by hand to follow
+the upstream schemas (they are not recordings) and are served by
+benchmarks/upstream_stub.py.
+
+Every weather route is driven twice: through the Flask test client (one request
+at a time, with per-stage timings) and over a real socket with concurrent
+clients (throughput and tail latency). Run it from anywhere:
+
+    python benchmarks/weather_bench.py --requests 300 --concurrency 8
+
+"cold" clears every weather cache before each request, so the full geocode,
+forecast, transform and render path runs against the stub upstream; "warm"
+primes the caches once and measures the steady state.
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+
+import requests
+from werkzeug.serving import make_server
+from upstream_stub import UpstreamStub
+
+from config import app
+import weather.helpers
+import weather.locations
+
+# No background work while measuring
+weather.locations.prewarm_location_index = lambda *args, **kwargs: None
+weather.helpers.periodic_forecast_refresh = lambda *args, **kwargs: None
+weather.locations.LOCATION_INDEX_PATH = os.path.join(tempfile.mkdtemp(prefix="weather-bench-"), "locations.db")
+
+import weather.geocoder
+import weather.routes
+
+LOCATIONS = [
+    {"lat": "25.0478", "lon": "121.5319", "locCode": "ASI|TW|TW018|TAIPEI"},
+    {"lat": "51.5072", "lon": "-0.1276", "locCode": "EUR|GB||LONDON"},
+    {"lat": "40.7306", "lon": "-73.9866", "locCode": "NAM|US||NEW YORK"},
+]
+
+SCENARIOS = [
+    ("getweather", "/getweather?lat={lat}&lon={lon}"),
+    ("lat-lon-search.asp", "/lat-lon-search.asp?lat={lat}&lon={lon}"),
+    ("htc/lat-lon-search.asp", "/widget/htc/lat-lon-search.asp?lat={lat}&lon={lon}"),
+    ("getstaticweather", "/getstaticweather?locCode={locCode}"),
+    ("forecast-data_v3.asp", "/forecast-data_v3.asp?locCode={locCode}"),
+    ("htc/forecast-data_v3.asp", "/widget/htc/forecast-data_v3.asp?locCode={locCode}"),
+    ("htc2 feed, metric", "/widget/htc2/weather-data.asp?locCode={locCode}&metric=1"),
+    ("htc2 feed, imperial", "/widget/htc2/weather-data.asp?locCode={locCode}&metric=0"),
+]
+
+
+class StageTimer:
+    # Collects (start, end) intervals per stage for the request in flight
+
+    def __init__(self):
+        self.intervals = {}
+        self.lock = threading.Lock()
+
+    def wrap(self, stage, func):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                with self.lock:
+                    self.intervals.setdefault(stage, []).append((start, end))
+        return timed
+
+    def reset(self):
+        with self.lock:
+            self.intervals = {}
+
+    def durations(self, total):
+        with self.lock:
+            intervals = dict(self.intervals)
+        stages = {stage: sum(end - start for start, end in spans) for stage, spans in intervals.items()}
+        # Geocode and forecast may overlap (getweather runs them concurrently)
+        upstream = _union_length(intervals.get("geocode", []) + intervals.get("forecast", []))
+        stages["transform"] = max(total - upstream - stages.get("render", 0.0), 0.0)
+        return stages
+
+
+def _union_length(spans):
+    length, current_start, current_end = 0.0, None, None
+    for start, end in sorted(spans):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                length += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        length += current_end - current_start
+    return length
+
+
+def install_stage_timer():
+    timer = StageTimer()
+    weather.geocoder.reverse_geocode = timer.wrap("geocode", weather.geocoder.reverse_geocode)
+    weather.locations.lookup_location = timer.wrap("geocode", weather.locations.lookup_location)
+    weather.helpers.get_forecast = timer.wrap("forecast", weather.helpers.get_forecast)
+    weather.routes.render_template = timer.wrap("render", weather.routes.render_template)
+    return timer
+
+
+def clear_caches():
+    weather.helpers._reverse_cache.clear()
+    weather.helpers._forecast_cache.clear()
+    weather.routes._rendered_cache.clear()
+    weather.locations._locations.clear()
+    weather.helpers._zone_day.cache_clear()
+    weather.helpers._zone_uses_dst.cache_clear()
+    weather.helpers.get_moon_phases.cache_clear()
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def urls_for(template, count):
+    return [template.format(**LOCATIONS[i % len(LOCATIONS)]) for i in range(count)]
+
+
+def prime(client, template):
+    for url in urls_for(template, len(LOCATIONS)):
+        client.get(url)
+
+
+def run_test_client(template, count, cold, timer):
+    client = app.test_client()
+    if not cold:
+        prime(client, template)
+    latencies, stage_totals, failures = [], {}, 0
+    for url in urls_for(template, count):
+        if cold:
+            clear_caches()
+        timer.reset()
+        start = time.perf_counter()
+        response = client.get(url)
+        total = time.perf_counter() - start
+        if response.status_code != 200:
+            failures += 1
+        latencies.append(total)
+        for stage, seconds in timer.durations(total).items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+    stages = {stage: seconds / count for stage, seconds in stage_totals.items()}
+    return latencies, stages, failures
+
+
+def run_socket(base_url, template, count, concurrency, cold):
+    urls = urls_for(template, count)
+    if not cold:
+        with requests.Session() as session:
+            for url in urls[:len(LOCATIONS)]:
+                session.get(base_url + url)
+
+    latencies, failures = [], [0]
+    lock = threading.Lock()
+    position = [0]
+
+    def worker():
+        with requests.Session() as session:
+            while True:
+                with lock:
+                    if position[0] >= len(urls):
+                        return
+                    url = urls[position[0]]
+                    position[0] += 1
+                if cold:
+                    # Approximate under concurrency: other requests may refill the caches
+                    clear_caches()
+                start = time.perf_counter()
+                response = session.get(base_url + url)
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    if response.status_code != 200:
+                        failures[0] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+    return latencies, len(urls) / wall, failures[0]
+
+
+def ms(seconds):
+    return f"{seconds * 1000:8.2f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and mode")
+    parser.add_argument("--concurrency", type=int, default=8, help="client threads for the socket run")
+    parser.add_argument("--upstream-latency", type=float, default=0.0, help="seconds added to every stub upstream response")
+    parser.add_argument("--mode", choices=["cold", "warm", "both"], default="both")
+    parser.add_argument("--offline-geocoder", action="store_true", help="answer reverse geocoding from the bundled gazetteer")
+    parser.add_argument("--only", help="run scenarios whose name contains this text")
+    args = parser.parse_args()
+
+    stub = UpstreamStub(latency=args.upstream_latency).start()
+    weather.helpers.NOMINATIM_URL = stub.url
+    weather.helpers.OPEN_METEO_URL = stub.url + "/v1/forecast"
+    weather.geocoder.OFFLINE_GEOCODER_ENABLED = args.offline_geocoder
+    if args.offline_geocoder:
+        weather.geocoder.load_gazetteer()
+
+    timer = install_stage_timer()
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    modes = ["cold", "warm"] if args.mode == "both" else [args.mode]
+    scenarios = [s for s in SCENARIOS if not args.only or args.only in s[0]]
+
+    print(f"{args.requests} requests per run, {args.concurrency} socket clients, "
+          f"upstream latency {args.upstream_latency * 1000:.0f} ms, offline geocoder {'on' if args.offline_geocoder else 'off'}")
+    print()
+    print("Test client (sequential), mean stage times and latency percentiles in ms")
+    print(f"{'scenario':<26}{'mode':<6}{'geocode':>9}{'forecast':>9}{'transform':>10}{'render':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'fail':>6}")
+    for name, template in scenarios:
+        for mode in modes:
+            latencies, stages, failures = run_test_client(template, args.requests, mode == "cold", timer)
+            print(f"{name:<26}{mode:<6}{ms(stages.get('geocode', 0.0)):>9}{ms(stages.get('forecast', 0.0)):>9}"
+                  f"{ms(stages.get('transform', 0.0)):>10}{ms(stages.get('render', 0.0)):>9}"
+                  f"{ms(percentile(latencies, 50)):>9}{ms(percentile(latencies, 95)):>9}{ms(percentile(latencies, 99)):>9}{failures:>6}")
+
+    print()
+    print(f"Socket ({args.concurrency} concurrent clients), throughput in req/s and latency percentiles in ms")
+    print(f"{'scenario':<26}{'mode':<6}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'fail':>6}")
+    for name, template in scenarios:
+        for mode in modes:
+            latencies, throughput, failures = run_socket(base_url, template, args.requests, args.concurrency, mode == "cold")
+            print(f"{name:<26}{mode:<6}{throughput:9.1f}{ms(percentile(latencies, 50)):>9}"
+                  f"{ms(percentile(latencies, 95)):>9}{ms(percentile(latencies, 99)):>9}{failures:>6}")
+
+    print()
+    print(f"Upstream requests served by the stub: {stub.requests}")
+    server.shutdown()
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import random
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+import stocks.markets
+
+# (symbol, name, exchange, exchange timezone, price around which it trades)
+SYMBOLS = [
+    ("^DJI", "Dow Jones Industrial Average", "DJI", "America/New_York", 46000),
+    ("^IXIC", "NASDAQ Composite", "Nasdaq GIDS", "America/New_York", 22000),
+    ("^GSPC", "S&P 500", "SNP", "America/New_York", 6600),
+    ("AAPL", "Apple Inc.", "NasdaqGS", "America/New_York", 250),
+    ("AAPL.MX", "Apple Inc.", "Mexico", "America/Mexico_City", 4600),
+    ("APLE", "Apple Hospitality REIT, Inc.", "NYSE", "America/New_York", 12),
+    ("APP", "AppLovin Corporation", "NasdaqGS", "America/New_York", 600),
+    ("MSFT", "Microsoft Corporation", "NasdaqGS", "America/New_York", 510),
+    ("GOOG", "Alphabet Inc.", "NasdaqGS", "America/New_York", 250),
+    ("AMZN", "Amazon.com, Inc.", "NasdaqGS", "America/New_York", 220),
+    ("META", "Meta Platforms, Inc.", "NasdaqGS", "America/New_York", 710),
+    ("NVDA", "NVIDIA Corporation", "NasdaqGS", "America/New_York", 180),
+    ("TSLA", "Tesla, Inc.", "NasdaqGS", "America/New_York", 430),
+    ("T", "AT&T Inc.", "NYSE", "America/New_York", 27),
+    ("PG", "Procter & Gamble Company (The)", "NYSE", "America/New_York", 150),
+    ("IBM", "International Business Machines Corporation", "NYSE", "America/New_York", 290),
+    ("INTC", "Intel Corporation", "NasdaqGS", "America/New_York", 37),
+    ("AMD", "Advanced Micro Devices, Inc.", "NasdaqGS", "America/New_York", 230),
+    ("QCOM", "QUALCOMM Incorporated", "NasdaqGS", "America/New_York", 165),
+    ("ORCL", "Oracle Corporation", "NYSE", "America/New_York", 300),
+    ("2330.TW", "Taiwan Semiconductor Manufacturing Company Limited", "Taiwan", "Asia/Taipei", 1400),
+    ("2498.TW", "HTC Corporation", "Taiwan", "Asia/Taipei", 45),
+    ("2317.TW", "Hon Hai Precision Industry Co., Ltd.", "Taiwan", "Asia/Taipei", 230),
+    ("0700.HK", "Tencent Holdings Limited", "HKSE", "Asia/Hong_Kong", 640),
+    ("9988.HK", "Alibaba Group Holding Limited", "HKSE", "Asia/Hong_Kong", 160),
+    ("7203.T", "Toyota Motor Corporation", "Tokyo", "Asia/Tokyo", 2900),
+    ("6758.T", "Sony Group Corporation", "Tokyo", "Asia/Tokyo", 4200),
+    ("005930.KS", "Samsung Electronics Co., Ltd.", "KSE", "Asia/Seoul", 90000),
+    ("SAP.DE", "SAP SE", "XETRA", "Europe/Berlin", 230),
+    ("SIE.DE", "Siemens Aktiengesellschaft", "XETRA", "Europe/Berlin", 235),
+    ("BP.L", "BP p.l.c.", "LSE", "Europe/London", 430),
+    ("HSBA.L", "HSBC Holdings plc", "LSE", "Europe/London", 1050),
+    ("MC.PA", "LVMH Moet Hennessy - Louis Vuitton, Societe Europeenne", "Paris", "Europe/Paris", 600),
+    ("OR.PA", "L'Oreal S.A.", "Paris", "Europe/Paris", 380),
+    ("NESN.SW", "Nestle S.A.", "Swiss", "Europe/Zurich", 80),
+    ("BHP.AX", "BHP Group Limited", "ASX", "Australia/Sydney", 42),
+    ("RELIANCE.NS", "Reliance Industries Limited", "NSE", "Asia/Kolkata", 1400),
+    ("EURUSD=X", "EUR/USD", "CCY", "Europe/London", 1.17),
+    ("BTC-USD", "Bitcoin USD", "CCC", "UTC", 110000),
+]
+BY_SYMBOL = {s[0]: s for s in SYMBOLS}
+
+
+def _seed(symbol):
+    return sum(map(ord, symbol))
+
+
+class StubFailure(Exception):
+    pass
+
+
+class FakeYahoo:
+    # Stands in for the parts of yfinance that stocks.helpers uses: Ticker.info,
+    # Ticker.history and Search. Every call sleeps `latency` seconds (plus up to
+    # `jitter`) and fails with probability `failure_rate`. Prices are deterministic
+    # per symbol and day, so repeated runs render the same responses.
+
+    def __init__(self, latency=0.0, jitter=0.0, failure_rate=0.0, seed=1):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.calls = {"info": 0, "history": 0, "search": 0}
+        self._lock = threading.Lock()
+        self._originals = None
+        self._frames = {}
+
+    def _upstream(self, kind):
+        with self._lock:
+            self.calls[kind] += 1
+            delay = self.latency + self.random.random() * self.jitter
+            fail = self.random.random() < self.failure_rate
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise StubFailure(f"injected {kind} failure")
+
+    def install(self):
+        stub = self
+
+        class Ticker:
+            def __init__(self, symbol):
+                self.ticker = symbol
+
+            @property
+            def info(self):
+                stub._upstream("info")
+                return stub.info(self.ticker)
+
+            def history(self, period=None, interval="1d", start=None, **kwargs):
+                stub._upstream("history")
+                return stub.history(self.ticker, period, start)
+
+        class Search:
+            def __init__(self, query, max_results=8, **kwargs):
+                stub._upstream("search")
+                self.quotes = stub.search(query, max_results)
+
+        self._originals = (yf.Ticker, yf.Search)
+        yf.Ticker, yf.Search = Ticker, Search
+        return self
+
+    def uninstall(self):
+        if self._originals:
+            yf.Ticker, yf.Search = self._originals
+            self._originals = None
+
+    def info(self, symbol):
+        entry = BY_SYMBOL.get(symbol)
+        if entry is None:
+            return {"trailingPegRatio": None}
+        _, name, exchange, timezone_name, base = entry
+        closes = self._frame(symbol)["Close"]
+        price, previous = float(closes.iloc[-1]), float(closes.iloc[-2])
+        is_open = stocks.markets.is_market_open(timezone_name)
+        offset = pd.Timestamp.now(tz=timezone_name).utcoffset().total_seconds()
+        return {
+            "symbol": symbol,
+            "longName": name,
+            "shortName": name[:32],
+            "fullExchangeName": exchange,
+            "exchangeTimezoneName": timezone_name,
+            "gmtOffSetMilliseconds": int(offset * 1000),
+            "marketState": "REGULAR" if is_open in (None, True) else "CLOSED",
+            "regularMarketTime": int(time.time()) - 60,
+            "regularMarketPrice": price,
+            "regularMarketPreviousClose": previous,
+            "regularMarketOpen": previous * 1.001,
+            "regularMarketDayHigh": max(price, previous) * 1.01,
+            "regularMarketDayLow": min(price, previous) * 0.99,
+            "regularMarketVolume": 1000000 + _seed(symbol) * 1999,
+            "regularMarketChange": price - previous,
+            "regularMarketChangePercent": (price - previous) / previous * 100,
+        }
+
+    def _frame(self, symbol):
+        # Twenty years of business days up to today, built once per symbol and day
+        timezone_name, base = BY_SYMBOL[symbol][3], BY_SYMBOL[symbol][4]
+        today = pd.Timestamp.now(tz=timezone_name).normalize()
+        key = (symbol, today)
+        frame = self._frames.get(key)
+        if frame is None:
+            index = pd.bdate_range(end=today.tz_localize(None), periods=20 * 262, tz=timezone_name)
+            frame = pd.DataFrame({"Close": self._closes(symbol, base, len(index)),
+                                  "Dividends": 0.0, "Stock Splits": 0.0}, index=index)
+            self._frames[key] = frame
+        return frame
+
+    def _closes(self, symbol, base, count):
+        # A random walk seeded by the symbol and ending at its base price, so every call sees the same history
+        walk = np.exp(np.random.default_rng(_seed(symbol)).normal(0, 0.015, 20 * 262)).cumprod()
+        return (base * walk / walk[-1])[-count:]
+
+    def history(self, symbol, period=None, start=None):
+        entry = BY_SYMBOL.get(symbol)
+        if entry is None:
+            return pd.DataFrame(columns=["Close", "Dividends", "Stock Splits"])
+        frame = self._frame(symbol)
+        if start is not None:
+            return frame[frame.index >= pd.Timestamp(int(start), unit="s", tz="UTC")]
+        if period in (None, "max"):
+            return frame
+        if period.endswith("d"):
+            return frame.iloc[-int(period[:-1]):]
+        now = pd.Timestamp.now(tz=entry[3]).normalize()
+        if period == "ytd":
+            return frame[frame.index >= now.replace(month=1, day=1)]
+        if period.endswith("mo"):
+            return frame[frame.index >= now - pd.DateOffset(months=int(period[:-2]))]
+        if period.endswith("y"):
+            return frame[frame.index >= now - pd.DateOffset(years=int(period[:-1]))]
+        return frame.iloc[-22:]
+
+    def search(self, query, max_results):
+        query = query.lower()
+        results = []
+        for symbol, name, exchange, _, _ in SYMBOLS:
+            if query in symbol.lower() or query in name.lower():
+                results.append({"symbol": symbol, "longname": name, "shortname": name[:32], "exchange": exchange})
+        return results[:max_results]
@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    # Thread-safe LRU cache where every entry also carries an expiry time.
+    # Expired entries are kept around for `stale_ttl` more seconds so callers
+    # can serve them while a refresh is in flight (see get_entry).
+
+    def __init__(self, maxsize=1024, ttl=3600, stale_ttl=0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        value, fresh = self.get_entry(key)
+        if value is None or not fresh:
+            return default
+        return value
+
+    def get_entry(self, key):
+        # Returns (value, fresh). value is None when the key is missing or
+        # past its stale window.
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, False
+            value, expires = entry
+            if now >= expires + self.stale_ttl:
+                del self._data[key]
+                self.misses += 1
+                return None, False
+            self._data.move_to_end(key)
+            fresh = now < expires
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return value, fresh
+
+    def ttl_left(self, key):
+        # Seconds until the entry expires (negative once stale), None when missing.
+        # Unlike get, this does not count as a hit or miss.
+        with self._lock:
+            entry = self._data.get(key)
+        if entry is None:
+            return None
+        return entry[1] - time.time()
+
+    def set(self, key, value, ttl=None):
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
@@ -10,10 +10,58 @@ WEATHER_ENABLED = True
 STOCKS_ENABLED = True
 YOUTUBE_ENABLED = True
 
+DATA_DIR = "data" # Where persistent caches and indexes are stored
+
+# Weather configuration
+WEATHER_REQUEST_DEADLINE = 10 # How long a weather request may wait for its upstream calls, time queued for a worker included (in seconds)
+WEATHER_UPSTREAM_WORKERS = 16 # How many geocoding and forecast calls of all weather requests run at the same time
+GEOCODE_CACHE_PRECISION = 2 # Coordinates are rounded to this many decimals (~1 km) before caching
+GEOCODE_CACHE_TTL = 7 # How long should reverse geocoding results be cached (in days)
+GEOCODE_CACHE_SIZE = 10000 # Maximum number of cached locations
+FORECAST_CACHE_PRECISION = 2 # Forecasts are shared by all coordinates rounding to the same cell
+FORECAST_CACHE_STALE = 6 # How long an outdated forecast may still be served while it refreshes (in hours)
+FORECAST_CACHE_SIZE = 5000 # Maximum number of cached forecasts
+FORECAST_REFRESH_TOP = 200 # How many of the most requested locations are kept warm in the background
+FORECAST_REFRESH_BATCH = 50 # Locations per batched Open-Meteo request
+LOCATION_SEED_FILE = "weather/seed_locations.txt" # Location codes resolved in the background at startup
+RESPONSE_CACHE_SIZE = 2000 # Maximum number of rendered htc2 weather responses kept in memory
+OFFLINE_GEOCODER_ENABLED = True # Resolve coordinates from a local gazetteer before asking Nominatim
+OFFLINE_GEOCODER_FILE = "weather/gazetteer.tsv" # Tab separated: latitude, longitude, city, country
+OFFLINE_GEOCODER_RADIUS = 20 # Maximum distance to the nearest gazetteer city (in km)
+
+# Stocks configuration
+QUOTE_WORKERS = 8 # How many symbols of a watchlist are fetched from Yahoo at the same time
+QUOTE_CACHE_TTL = 60 # How long quotes are cached while their market is open (in seconds)
+QUOTE_CACHE_CLOSED_TTL = 900 # Used for closed markets whose next opening is unknown (in seconds)
+QUOTE_CACHE_CLOSE_GRACE = 15 # Quotes keep the short TTL this long after the close, until closing prices settle (in minutes)
+QUOTE_CACHE_SIZE = 5000 # Maximum number of cached quotes
+QUOTE_CACHE_STALE = 24 # How long an outdated quote may still stand in for one that could not be fetched (in hours)
+QUOTE_REQUEST_DEADLINE = 3 # How long a getquotes request may wait for Yahoo (in seconds)
+QUOTE_PREFETCH_TOP = 100 # How many of the most requested symbols are kept warm in the background
+QUOTE_PREFETCH_BATCH = 4 # Symbols refreshed at a time, leaving workers free for requests
+QUOTE_PREFETCH_INTERVAL = 60 # How often quotes about to expire are refreshed (in seconds)
+QUOTE_PREFETCH_MIN_REQUESTS = 3 # Recent requests (decayed with the half-life below) a symbol needs before it is prefetched
+QUOTE_POPULARITY_HALF_LIFE = 60 # How quickly past requests stop counting towards popularity (in minutes)
+SEARCH_CACHE_TTL = 24 # How long symbol search results are cached (in hours)
+SEARCH_CACHE_SIZE = 2000 # Maximum number of cached search phrases
+SEARCH_FETCH_SIZE = 30 # Results fetched per search, so the following pages are served from the cache
+SEARCH_LOCAL_INDEX = True # Answer searches from symbols seen before when there are enough matches
+HISTORY_REFRESH_INTERVAL = 15 # How often stored chart history is topped up with newer bars (in minutes)
+METADATA_TTL = 30 # How long stored symbol names and exchanges are used before being refreshed (in days)
+CHART_MAX_POINTS = 300 # Longer charts are downsampled to this many points, keeping their shape (0 keeps every point)
+
 # YouTube configuration
 YOUTUBE_API_KEY = "YOUR_YOUTUBE_API_KEY_HERE"
 VIDEO_LIFETIME = 3 # How long should videos be stored (in days)
 CLEANUP_INTERVAL = 1 # How often to check for expired videos (in hours)
+YOUTUBE_VIDEOS_CACHE_TTL = 10 # How long video details from the Data API are cached (in minutes)
+YOUTUBE_STATISTICS_CACHE_TTL = 10 # Responses with view, like or subscriber counts are cached at most this long, whatever the resource (in minutes)
+YOUTUBE_PLAYLIST_CACHE_TTL = 30 # How long playlist contents such as channel uploads are cached (in minutes)
+YOUTUBE_SEARCH_CACHE_TTL = 6 # How long video search results are cached (in hours)
+YOUTUBE_CHANNELS_CACHE_TTL = 3 # How long channel details and channel searches are cached (in days)
+YOUTUBE_CACHE_SIZE = 5000 # Maximum number of Data API responses also kept in memory
+YOUTUBE_CACHE_STALE = 24 # How long an outdated response may still be served when the Data API fails (in hours)
+YOUTUBE_CHANNEL_INDEX_TTL = 30 # How long a username stays mapped to the channel it resolved to before it is looked up again (in days)
 
 # Optional: Enable proxy support if behind a reverse proxy
 # from werkzeug.middleware.proxy_fix import ProxyFix
@@ -0,0 +1,46 @@
+import numpy as np
+
+
+def lttb(ts, values, threshold: int):
+    # Largest-Triangle-Three-Buckets: keeps the first and last point and, from each
+    # bucket in between, the point forming the largest triangle with the point kept
+    # before it and the average of the next bucket. Returns the indices to keep.
+    n = len(values)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(ts, dtype=float)
+    y = np.asarray(values, dtype=float)
+    # Bucket boundaries for the n - 2 points between the first and the last
+    edges = np.floor(np.linspace(1, n - 1, threshold - 1)).astype(np.int64)
+
+    # Average point of every bucket, the last "bucket" being the last point alone
+    bounds = np.append(edges, n)
+    sizes = np.diff(bounds)
+    avg_x = np.add.reduceat(x, bounds[:-1]) / sizes
+    avg_y = np.add.reduceat(y, bounds[:-1]) / sizes
+
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0] = 0
+    kept[-1] = n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        px, py = x[previous], y[previous]
+        areas = np.abs((px - avg_x[i + 1]) * (y[start:end] - py) - (px - x[start:end]) * (avg_y[i + 1] - py))
+        previous = start + int(np.argmax(areas))
+        kept[i + 1] = previous
+    return kept
+
+
+def chart_points(bars, max_points: int = 0):
+    # (closes, timestamps) as formatted strings, downsampled to at most max_points (0 keeps all)
+    ts = bars["ts"]
+    closes = bars["close"]
+    if max_points and len(bars) > max_points:
+        valid = ~np.isnan(closes)
+        ts, closes = ts[valid], closes[valid]
+        kept = lttb(ts, closes, max_points)
+        ts, closes = ts[kept], closes[kept]
+    return (np.char.mod("%.2f", closes).tolist(),
+            np.char.mod("%.1f", np.asarray(ts, dtype=float)).tolist())
@@ -1,7 +1,40 @@
 import xml.etree.ElementTree as ET
-from flask import render_template, Response
+from xml.parsers import expat
+from flask import Response
 from datetime import datetime, timezone
 import yfinance as yf
+import concurrent.futures
+import threading
+import time
+import stocks.charts
+import stocks.history
+import stocks.markets
+import stocks.metadata
+import stocks.serializers
+import stocks.symbols
+from cache import TTLCache
+from config import QUOTE_WORKERS, QUOTE_CACHE_TTL, QUOTE_CACHE_CLOSED_TTL, QUOTE_CACHE_SIZE
+from config import QUOTE_CACHE_STALE, QUOTE_CACHE_CLOSE_GRACE, QUOTE_REQUEST_DEADLINE
+from config import QUOTE_PREFETCH_TOP, QUOTE_PREFETCH_BATCH, QUOTE_PREFETCH_INTERVAL, QUOTE_PREFETCH_MIN_REQUESTS
+from config import QUOTE_POPULARITY_HALF_LIFE
+from config import SEARCH_CACHE_TTL, SEARCH_CACHE_SIZE, SEARCH_FETCH_SIZE, SEARCH_LOCAL_INDEX
+from config import CHART_MAX_POINTS
+
+_quote_executor = concurrent.futures.ThreadPoolExecutor(max_workers=QUOTE_WORKERS)
+# Expired quotes are kept as the last known value for symbols that miss the request deadline
+_quote_cache = TTLCache(maxsize=QUOTE_CACHE_SIZE, ttl=QUOTE_CACHE_TTL, stale_ttl=QUOTE_CACHE_STALE * 60 * 60)
+# symbol -> future of the upstream fetch in flight
+_quote_refreshing = {}
+_quote_refresh_lock = threading.Lock()
+
+# Request counts per symbol, decaying with QUOTE_POPULARITY_HALF_LIFE so old favourites fade out
+_quote_popularity = {}
+_quote_popularity_lock = threading.Lock()
+
+# normalized phrase -> (results, how many results were asked for, whether they came from the local index)
+_search_cache = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL * 60 * 60)
+# Every symbol seen in search results and quotes, for answering searches locally
+_symbol_index = stocks.symbols.SymbolIndex()
 
 def request_to_dict(request):
     def recurse(node):
@@ -42,114 +75,313 @@ def request_to_dict(request):
     root = ET.fromstring(request)
     return {root.tag: recurse(root)}
 
-def get_quotes(symbols):
-    quotes_data = []
+# Children of <query> that carry a request field
+QUERY_FIELDS = frozenset(("phrase", "count", "offset", "symbol", "range"))
+
+def parse_query(body):
+    # Streams a request body (str or bytes) through expat and keeps only what the
+    # handlers read: the <query> attributes (type, ...), its known fields and the
+    # texts of its <list> items. A lighter alternative to request_to_dict.
+    query = {}
+    items = []
+    text = []
+    depth = 0
+    in_query = False
+    section = None
+
+    def start(tag, attrs):
+        nonlocal depth, in_query, section
+        depth += 1
+        if depth == 2:
+            in_query = tag == "query"
+            if in_query:
+                query.update(attrs)
+        elif depth == 3:
+            section = tag
+        text.clear()
+
+    def end(tag):
+        nonlocal depth
+        if in_query:
+            if depth == 4 and section == "list":
+                items.append("".join(text).strip())
+            elif depth == 3 and tag in QUERY_FIELDS:
+                query[tag] = "".join(text).strip()
+        depth -= 1
+
+    parser = expat.ParserCreate()
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = text.append
+    parser.Parse(body, True)
+    query["list"] = items
+    return query
+
+def quote_ttl(info, now: datetime = None):
+    # Quotes only move during the regular session, so outside of it they stay
+    # valid until the exchange opens again
+    market_state = info.get('marketState')
+    if market_state == 'REGULAR':
+        return QUOTE_CACHE_TTL
+
+    timezone_name = info.get('exchangeTimezoneName')
+    if timezone_name:
+        # Right after the close Yahoo may still report the price from before the
+        # closing auction, which must not be kept over a night or a weekend
+        since_close = stocks.markets.seconds_since_close(timezone_name, now)
+        if (since_close is not None and since_close < QUOTE_CACHE_CLOSE_GRACE * 60
+                and not stocks.markets.is_market_open(timezone_name, now)):
+            return QUOTE_CACHE_TTL
+
+    wait = stocks.markets.seconds_until_open(timezone_name, now) if timezone_name else None
+    if not wait:
+        # Unknown exchange, or open by the table but not according to Yahoo (e.g. a holiday)
+        return QUOTE_CACHE_TTL if market_state is None else QUOTE_CACHE_CLOSED_TTL
+    return max(wait, QUOTE_CACHE_TTL)
+
+def refresh_quote(symbol):
+    # Starts fetching a quote into the cache unless that is already in flight, returns the future
+    with _quote_refresh_lock:
+        future = _quote_refreshing.get(symbol)
+        if future is None:
+            future = _quote_executor.submit(_update_quote, symbol)
+            _quote_refreshing[symbol] = future
+    return future
+
+def _update_quote(symbol):
+    try:
+        quote, ttl = _fetch_quote(symbol)
+        _quote_cache.set(symbol, quote, ttl=ttl)
+        _symbol_index.add(quote['symbol'], quote['name'])
+        return quote
+    except Exception:
+        # Symbols that fail (e.g. unknown to Yahoo) are not prefetched until they earn their place again
+        with _quote_popularity_lock:
+            _quote_popularity.pop(symbol, None)
+        raise
+    finally:
+        with _quote_refresh_lock:
+            _quote_refreshing.pop(symbol, None)
+
+def cache_stats():
+    return {"quotes": _quote_cache.stats(), "searches": _search_cache.stats(), "symbols": len(_symbol_index)}
+
+def _fetch_quote(symbol):
+    try:
+        ticker = yf.Ticker(symbol)
+        info = ticker.info
+        stocks.metadata.offer_info(symbol, info)
+
+        raw_timestamp = info.get('regularMarketTime')
+        if raw_timestamp is not None:
+            timestamp = datetime.fromtimestamp(raw_timestamp, tz=timezone.utc).timestamp()
+        else:
+            timestamp = datetime.utcnow().timestamp()
+
+        name = info.get('longName', info.get('shortName', symbol))
+        current_price = info.get('regularMarketPrice')
+        previous_close = info.get('regularMarketPreviousClose')
+        open_price = info.get('regularMarketOpen')
+        day_high = info.get('regularMarketDayHigh')
+        day_low = info.get('regularMarketDayLow')
+        volume = info.get('regularMarketVolume')
+        change = info.get('regularMarketChange')
+        change_percent = info.get('regularMarketChangePercent')
+
+        if change is None and current_price is not None and previous_close is not None:
+            change = current_price - previous_close
+        if change_percent is None and current_price is not None and previous_close is not None and previous_close != 0:
+            change_percent = (change / previous_close) * 100 if change is not None else None
 
-    for symbol in symbols:
-        try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
 
-            raw_timestamp = info.get('regularMarketTime')
-            if raw_timestamp is not None:
-                timestamp = datetime.fromtimestamp(raw_timestamp, tz=timezone.utc).timestamp()
+        link = f"https://finance.yahoo.com/quote/{symbol}"
+
+        quote = {
+            'name': name,
+            'symbol': symbol,
+            'timestamp': timestamp,
+            'link': link,
+            'price': f"{current_price:.2f}" if current_price is not None else "N/A",
+            'change': {
+                'value': f"{change:+.2f}" if change is not None else "N/A",
+                'percent': f"{change_percent:+.2f}" if change_percent is not None else "N/A"
+            },
+            'open': f"{open_price:.2f}" if open_price is not None else "N/A",
+            'high': f"{day_high:.2f}" if day_high is not None else "N/A",
+            'low': f"{day_low:.2f}" if day_low is not None else "N/A",
+            'volume': volume if volume is not None else "N/A"
+        }
+        return quote, quote_ttl(info)
+    except Exception as e:
+        raise Exception(f"Error fetching data for {symbol}: {e}")
+
+def fetch_quotes(symbols, deadline: float = QUOTE_REQUEST_DEADLINE):
+    # Yahoo has no batched endpoint for the quote fields we need (yf.Tickers still
+    # loads .info one symbol at a time), so the symbols are fetched in parallel.
+    # Symbols that fail or miss the deadline are answered with their last known
+    # quote while the fetch carries on in the background, or left out if there is none.
+    # Returns (quotes in the order of the given symbols, symbols served stale).
+    unique_symbols = list(dict.fromkeys(symbols))
+    with _quote_popularity_lock:
+        for symbol in unique_symbols:
+            _quote_popularity[symbol] = _quote_popularity.get(symbol, 0) + 1
+
+    quotes, last_known, pending = {}, {}, {}
+    for symbol in unique_symbols:
+        quote, fresh = _quote_cache.get_entry(symbol)
+        if fresh:
+            quotes[symbol] = quote
+            continue
+        if quote is not None:
+            last_known[symbol] = quote
+        pending[symbol] = refresh_quote(symbol)
+
+    if pending:
+        concurrent.futures.wait(pending.values(), timeout=deadline)
+
+    stale_symbols = []
+    for symbol, future in pending.items():
+        if future.done() and future.exception() is None:
+            quotes[symbol] = future.result()
+            continue
+        if not future.done():
+            print(f"Quote for {symbol} missed the request deadline")
+        if symbol in last_known:
+            quotes[symbol] = last_known[symbol]
+            stale_symbols.append(symbol)
+
+    return [quotes[symbol] for symbol in symbols if symbol in quotes], stale_symbols
+
+def refresh_popular_quotes(top: int = QUOTE_PREFETCH_TOP, batch_size: int = QUOTE_PREFETCH_BATCH,
+                           horizon: float = QUOTE_PREFETCH_INTERVAL):
+    # Refreshes the most requested symbols whose quote is missing or expires within
+    # `horizon` seconds, so requests until the next run find them fresh. Quotes of
+    # closed markets are cached until the next open and are skipped until then.
+    # Symbols requested fewer than QUOTE_PREFETCH_MIN_REQUESTS times (after decay)
+    # are left to requests.
+    decay = 0.5 ** (horizon / (QUOTE_POPULARITY_HALF_LIFE * 60))
+    with _quote_popularity_lock:
+        popular = sorted(_quote_popularity, key=_quote_popularity.get, reverse=True)[:top]
+        popular = [symbol for symbol in popular if _quote_popularity[symbol] >= QUOTE_PREFETCH_MIN_REQUESTS]
+        for symbol in list(_quote_popularity):
+            _quote_popularity[symbol] *= decay
+            if _quote_popularity[symbol] < 0.5:
+                del _quote_popularity[symbol]
+
+    due = []
+    for symbol in popular:
+        ttl_left = _quote_cache.ttl_left(symbol)
+        if ttl_left is None or ttl_left < horizon:
+            due.append(symbol)
+
+    refreshed = 0
+    for i in range(0, len(due), batch_size):
+        futures = [refresh_quote(symbol) for symbol in due[i:i + batch_size]]
+        concurrent.futures.wait(futures)
+        for future in futures:
+            if future.exception() is None:
+                refreshed += 1
             else:
-                timestamp = datetime.utcnow().timestamp()
-
-            name = info.get('longName', info.get('shortName', symbol))
-            current_price = info.get('regularMarketPrice')
-            previous_close = info.get('regularMarketPreviousClose')
-            open_price = info.get('regularMarketOpen')
-            day_high = info.get('regularMarketDayHigh')
-            day_low = info.get('regularMarketDayLow')
-            volume = info.get('regularMarketVolume')
-            change = info.get('regularMarketChange')
-            change_percent = info.get('regularMarketChangePercent')
-
-            if change is None and current_price is not None and previous_close is not None:
-                change = current_price - previous_close
-            if change_percent is None and current_price is not None and previous_close is not None and previous_close != 0:
-                change_percent = (change / previous_close) * 100 if change is not None else None
-
-
-            link = f"https://finance.yahoo.com/quote/{symbol}"
-
-            quote = {
-                'name': name,
-                'symbol': symbol,
-                'timestamp': timestamp,
-                'link': link,
-                'price': f"{current_price:.2f}" if current_price is not None else "N/A",
-                'change': {
-                    'value': f"{change:+.2f}" if change is not None else "N/A",
-                    'percent': f"{change_percent:+.2f}" if change_percent is not None else "N/A"
-                },
-                'open': f"{open_price:.2f}" if open_price is not None else "N/A",
-                'high': f"{day_high:.2f}" if day_high is not None else "N/A",
-                'low': f"{day_low:.2f}" if day_low is not None else "N/A",
-                'volume': volume if volume is not None else "N/A"
-            }
-            quotes_data.append(quote)
-        except Exception as e:
-            raise Exception(f"Error fetching data for {symbol}: {e}")
-
-    response_xml = render_template("stockquotes.xml", quotes=quotes_data)
+                print(f"Quote prefetch error: {future.exception()}")
+    return refreshed
+
+def periodic_quote_prefetch(interval_seconds: float = QUOTE_PREFETCH_INTERVAL):
+    def run():
+        while True:
+            time.sleep(interval_seconds)
+            try:
+                refresh_popular_quotes(horizon=interval_seconds)
+            except Exception as e:
+                print(f"Quote prefetch error: {e}")
+    t = threading.Thread(target=run, daemon=True)
+    t.start()
+
+def get_quotes(symbols):
+    quotes_data, stale_symbols = fetch_quotes(symbols)
+
+    response_xml = stocks.serializers.quotes_xml(quotes_data)
     response = Response(response_xml, mimetype="application/xml; charset=utf-8")
+    if stale_symbols:
+        response.headers["X-Stale-Symbols"] = ",".join(stale_symbols)
     return response
 
-def get_symbols(search_query, count, offset):
-    quotes_data = []
+def search_symbols(search_query, limit):
+    # Every page of a phrase is sliced from one cached list, so pages never repeat or
+    # skip results. The list is filled from the local index while it has enough
+    # matches, then from Yahoo, and growing it only appends symbols not served yet.
+    # Only Yahoo running short means there are no more results.
+    phrase = stocks.symbols.normalize_phrase(search_query)
+    cached = _search_cache.get(phrase)
+    if cached is not None:
+        results, complete, local = cached
+        if len(results) >= limit or complete:
+            return results[:limit]
+    else:
+        results, local = [], SEARCH_LOCAL_INDEX
+
+    requested = max(limit, SEARCH_FETCH_SIZE)
+    found = _symbol_index.search(phrase, requested) if local else []
+    if len(found) < limit:
+        # The index has run out of matches, Yahoo may know more. Once a phrase has
+        # gone to Yahoo it stays there, so its order is kept for the later pages.
+        local = False
+        found = _search_yahoo(search_query, requested)
+    complete = not local and len(found) < requested
+
+    served = {result['symbol'] for result in results}
+    results = results + [result for result in found if result['symbol'] not in served]
+    _search_cache.set(phrase, (results, complete, local))
+    return results[:limit]
 
+def _search_yahoo(search_query, requested):
     try:
-        max_results_to_fetch = offset + count
-        search_results = yf.Search(search_query, max_results=max_results_to_fetch).quotes
-
-        relevant_results = search_results[offset : offset + count]
-
-        for item in relevant_results:
-            name = item.get('longname', item.get('shortname', item.get('symbol', 'N/A')))
-            symbol = item.get('symbol', 'N/A')
-            quotes_data.append({
-                'name': name,
-                'symbol': symbol
-            })
+        search_results = yf.Search(search_query, max_results=requested).quotes
     except Exception as e:
         raise Exception(f"Error searching for symbols with yfinance: {e}")
 
-    response_xml = render_template("stocksymbols.xml", quotes=quotes_data)
+    results = []
+    for item in search_results:
+        name = item.get('longname', item.get('shortname', item.get('symbol', 'N/A')))
+        symbol = item.get('symbol', 'N/A')
+        results.append({
+            'name': name,
+            'symbol': symbol
+        })
+        _symbol_index.add(symbol, name)
+    return results
+
+def get_symbols(search_query, count, offset):
+    quotes_data = search_symbols(search_query, offset + count)[offset : offset + count]
+
+    response_xml = stocks.serializers.symbols_xml(quotes_data)
     response = Response(response_xml, mimetype="application/xml; charset=utf-8")
     return response
 
 def get_chart(symbol, chart_range):
-    points_data = []
     symbol_meta = {}
 
     try:
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
+        metadata = stocks.metadata.get_metadata(symbol)
 
-        symbol_meta['name'] = info.get('longName', info.get('shortName', symbol))
-        # marketopen and marketclose are not directly available in yfinance info.
-        symbol_meta['marketopen'] = "N/A" # Placeholder
-        symbol_meta['marketclose'] = "N/A" # Placeholder
-        gmtoffset_ms = info.get('gmtOffSetMilliseconds', 0)
-        symbol_meta['gmtoffset'] = int(gmtoffset_ms / 1000)
+        symbol_meta['name'] = metadata['name']
+        # Latest regular session as unix timestamps, from the exchange hours table
+        session = stocks.markets.last_session(metadata['timezone']) if metadata['timezone'] else None
+        symbol_meta['marketopen'] = session[0] if session else "N/A"
+        symbol_meta['marketclose'] = session[1] if session else "N/A"
+        symbol_meta['gmtoffset'] = stocks.metadata.utc_offset(metadata)
         symbol_meta['application_data'] = '\\Application Data\\HTC\\ygo\\'
 
 
-        hist = ticker.history(period=chart_range if chart_range[-1] != 'm' else chart_range + 'o')
+        bars = stocks.history.get_bars(symbol, chart_range)
+        if bars is None:
+            # Ranges the history store does not understand go to Yahoo directly
+            hist = yf.Ticker(symbol).history(period=chart_range if chart_range[-1] != 'm' else chart_range + 'o')
+            bars = stocks.history.to_bars(hist)
 
-        for index, row in hist.iterrows():
-            timestamp_unix = index.timestamp()
-            close_price = row.get('Close')
-            if close_price is not None:
-                points_data.append({
-                    'close': f"{close_price:.2f}",
-                    'timestamp': f"{timestamp_unix:.1f}"
-                })
+        closes, timestamps = stocks.charts.chart_points(bars, CHART_MAX_POINTS)
     except Exception as e:
         raise Exception(f"Error fetching chart data for {symbol} with range {chart_range}: {e}")
 
-    response_xml = render_template("stockchart.xml", points=points_data, symbol=symbol_meta)
+    response_xml = stocks.serializers.chart_xml(symbol_meta, closes, timestamps)
     response = Response(response_xml, mimetype="application/xml; charset=utf-8")
     return response
\ No newline at end of file
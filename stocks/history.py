@@ -0,0 +1,182 @@
+from config import DATA_DIR, HISTORY_REFRESH_INTERVAL
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from urllib.parse import quote
+import json
+import os
+import re
+import threading
+import time
+
+HISTORY_DIR = os.path.join(DATA_DIR, "history")
+
+# One row per bar, stored as a plain .npy file per symbol and interval so it can be memory-mapped
+BAR_DTYPE = np.dtype([("ts", "<i8"), ("close", "<f8")])
+
+_RANGE_PATTERN = re.compile(r"^(\d+)(d|wk|mo|m|y)$")
+
+# (symbol, interval) -> lock, so one symbol is only fetched by one request at a time
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def _lock_for(symbol: str, interval: str):
+    with _locks_lock:
+        return _locks.setdefault((symbol, interval), threading.Lock())
+
+
+def _paths(symbol: str, interval: str):
+    name = f"{quote(symbol, safe='')}_{interval}"
+    return os.path.join(HISTORY_DIR, name + ".npy"), os.path.join(HISTORY_DIR, name + ".json")
+
+
+def load_bars(symbol: str, interval: str = "1d"):
+    bars_path, _ = _paths(symbol, interval)
+    if not os.path.exists(bars_path):
+        return np.empty(0, dtype=BAR_DTYPE)
+    return np.load(bars_path, mmap_mode="r")
+
+
+def _load_meta(symbol: str, interval: str):
+    # {"from": oldest timestamp covered, "max": whole history stored, "checked": last upstream check}
+    _, meta_path = _paths(symbol, interval)
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save(symbol: str, interval: str, bars, meta):
+    # Written to temporary files and renamed, so readers never map a half written file
+    os.makedirs(HISTORY_DIR, exist_ok=True)
+    bars_path, meta_path = _paths(symbol, interval)
+    with open(bars_path + ".tmp", "wb") as f:
+        np.save(f, np.ascontiguousarray(bars, dtype=BAR_DTYPE))
+    os.replace(bars_path + ".tmp", bars_path)
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(meta_path + ".tmp", meta_path)
+
+
+def to_bars(hist):
+    bars = np.empty(len(hist), dtype=BAR_DTYPE)
+    if len(hist):
+        bars["ts"] = (hist.index - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)
+        bars["close"] = hist["Close"].to_numpy(dtype=float)
+    return bars
+
+
+def _has_corporate_actions(hist, after: int):
+    # Dividends and splits make Yahoo re-adjust every earlier close
+    if not len(hist):
+        return False
+    ts = (hist.index - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)
+    newer = np.asarray(ts) > after
+    for column in ("Dividends", "Stock Splits"):
+        if column in hist and (hist[column].to_numpy()[newer] != 0).any():
+            return True
+    return False
+
+
+def utc_offset(bars):
+    # Daily bars are stamped at the exchange's local midnight, which gives away its UTC offset
+    if not len(bars):
+        return 0
+    offset = -(int(bars["ts"][-1]) % (24 * 60 * 60))
+    return offset + 24 * 60 * 60 if offset < -12 * 60 * 60 else offset
+
+
+def range_start(chart_range: str, now: float = None, offset: int = 0):
+    # Oldest timestamp a range needs (0 for max), None when the range is not understood.
+    # Ranges start at local midnight, `offset` being the exchange's UTC offset in seconds.
+    now = now or time.time()
+    chart_range = chart_range.lower()
+    if chart_range == "max":
+        return 0
+    local_now = pd.Timestamp(now + offset, unit="s")
+    if chart_range == "ytd":
+        start = pd.Timestamp(year=local_now.year, month=1, day=1)
+    else:
+        match = _RANGE_PATTERN.match(chart_range)
+        if not match:
+            return None
+        n, unit = int(match.group(1)), match.group(2)
+        if unit == "d":
+            # Day ranges count trading days, leave room for weekends and holidays
+            start = local_now - pd.DateOffset(days=2 * n + 7)
+        elif unit == "wk":
+            start = local_now - pd.DateOffset(weeks=n)
+        elif unit in ("m", "mo"):
+            start = local_now - pd.DateOffset(months=n)
+        else:
+            start = local_now - pd.DateOffset(years=n)
+    return int(start.normalize().timestamp()) - offset
+
+
+def slice_range(bars, chart_range: str, now: float = None):
+    chart_range = chart_range.lower()
+    match = _RANGE_PATTERN.match(chart_range)
+    if match and match.group(2) == "d":
+        # Like Yahoo, "5d" is the last five trading days
+        return bars[-int(match.group(1)):]
+    start = range_start(chart_range, now, utc_offset(bars))
+    return bars[np.searchsorted(bars["ts"], start, side="left"):]
+
+
+def get_bars(symbol: str, chart_range: str, interval: str = "1d"):
+    # Bars for a chart range from the local store, fetching from Yahoo only what is
+    # missing: older bars when the range reaches further back than anything stored,
+    # and bars since the last stored one once HISTORY_REFRESH_INTERVAL has passed
+    start = range_start(chart_range)
+    if start is None:
+        return None
+    if start:
+        # Margin for exchanges east of UTC, whose local midnight is the previous day in UTC
+        start -= 24 * 60 * 60
+
+    with _lock_for(symbol, interval):
+        bars = load_bars(symbol, interval)
+        meta = _load_meta(symbol, interval)
+        now = time.time()
+
+        if meta is None or not len(bars) or (start < meta["from"] and not meta["max"]):
+            bars, meta = _fetch_all(symbol, interval, start, now)
+        elif now - meta["checked"] > HISTORY_REFRESH_INTERVAL * 60:
+            bars, meta = _fetch_newer(symbol, interval, bars, meta, now)
+
+        return slice_range(bars, chart_range, now)
+
+
+def _fetch_all(symbol: str, interval: str, start: int, now: float):
+    ticker = yf.Ticker(symbol)
+    if start == 0:
+        hist = ticker.history(period="max", interval=interval)
+    else:
+        hist = ticker.history(start=start, interval=interval)
+    bars = to_bars(hist)
+    meta = {"from": start, "max": start == 0, "checked": now}
+    _save(symbol, interval, bars, meta)
+    return load_bars(symbol, interval), meta
+
+
+def _fetch_newer(symbol: str, interval: str, bars, meta, now: float):
+    last = int(bars["ts"][-1])
+    try:
+        # From a day before the last bar, which may have been stored mid-session
+        hist = yf.Ticker(symbol).history(start=last - 24 * 60 * 60, interval=interval)
+    except Exception as e:
+        print(f"History refresh failed for {symbol}, serving stored bars: {e}")
+        return bars, meta
+
+    if _has_corporate_actions(hist, last):
+        return _fetch_all(symbol, interval, 0 if meta["max"] else meta["from"], now)
+
+    meta = dict(meta, checked=now)
+    newer = to_bars(hist)
+    if len(newer):
+        kept = bars[bars["ts"] < newer["ts"][0]]
+        bars = np.concatenate([kept, newer])
+    _save(symbol, interval, bars, meta)
+    return load_bars(symbol, interval), meta
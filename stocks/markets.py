@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta, timezone, time as dtime
+from zoneinfo import ZoneInfo
+
+# Regular trading session per exchange, keyed by Yahoo's exchangeTimezoneName.
+# (open, close, trading weekdays with Monday = 0). Lunch breaks and holidays
+# are not tracked, a closed market on a holiday only costs one extra refresh.
+WEEKDAYS = (0, 1, 2, 3, 4)
+MARKET_HOURS = {
+    "America/New_York": (dtime(9, 30), dtime(16, 0), WEEKDAYS),
+    "America/Chicago": (dtime(8, 30), dtime(15, 0), WEEKDAYS),
+    "America/Toronto": (dtime(9, 30), dtime(16, 0), WEEKDAYS),
+    "America/Mexico_City": (dtime(8, 30), dtime(15, 0), WEEKDAYS),
+    "America/Sao_Paulo": (dtime(10, 0), dtime(17, 0), WEEKDAYS),
+    "Europe/London": (dtime(8, 0), dtime(16, 30), WEEKDAYS),
+    "Europe/Dublin": (dtime(8, 0), dtime(16, 30), WEEKDAYS),
+    "Europe/Paris": (dtime(9, 0), dtime(17, 30), WEEKDAYS),
+    "Europe/Berlin": (dtime(9, 0), dtime(17, 30), WEEKDAYS),
+    "Europe/Amsterdam": (dtime(9, 0), dtime(17, 30), WEEKDAYS),
+    "Europe/Brussels": (dtime(9, 0), dtime(17, 30), WEEKDAYS),
+    "Europe/Madrid": (dtime(9, 0), dtime(17, 30), WEEKDAYS),
+    "Europe/Rome": (dtime(9, 0), dtime(17, 30), WEEKDAYS),
+    "Europe/Zurich": (dtime(9, 0), dtime(17, 30), WEEKDAYS),
+    "Europe/Stockholm": (dtime(9, 0), dtime(17, 30), WEEKDAYS),
+    "Europe/Oslo": (dtime(9, 0), dtime(16, 20), WEEKDAYS),
+    "Europe/Copenhagen": (dtime(9, 0), dtime(17, 0), WEEKDAYS),
+    "Europe/Helsinki": (dtime(10, 0), dtime(18, 30), WEEKDAYS),
+    "Europe/Warsaw": (dtime(9, 0), dtime(17, 0), WEEKDAYS),
+    "Europe/Istanbul": (dtime(10, 0), dtime(18, 0), WEEKDAYS),
+    "Asia/Tokyo": (dtime(9, 0), dtime(15, 30), WEEKDAYS),
+    "Asia/Seoul": (dtime(9, 0), dtime(15, 30), WEEKDAYS),
+    "Asia/Taipei": (dtime(9, 0), dtime(13, 30), WEEKDAYS),
+    "Asia/Hong_Kong": (dtime(9, 30), dtime(16, 0), WEEKDAYS),
+    "Asia/Shanghai": (dtime(9, 30), dtime(15, 0), WEEKDAYS),
+    "Asia/Singapore": (dtime(9, 0), dtime(17, 0), WEEKDAYS),
+    "Asia/Kolkata": (dtime(9, 15), dtime(15, 30), WEEKDAYS),
+    "Asia/Jakarta": (dtime(9, 0), dtime(16, 0), WEEKDAYS),
+    "Asia/Bangkok": (dtime(10, 0), dtime(16, 30), WEEKDAYS),
+    "Asia/Riyadh": (dtime(10, 0), dtime(15, 0), (6, 0, 1, 2, 3)),
+    "Asia/Jerusalem": (dtime(9, 59), dtime(17, 25), (6, 0, 1, 2, 3)),
+    "Australia/Sydney": (dtime(10, 0), dtime(16, 0), WEEKDAYS),
+    "Pacific/Auckland": (dtime(10, 0), dtime(16, 45), WEEKDAYS),
+    "Africa/Johannesburg": (dtime(9, 0), dtime(17, 0), WEEKDAYS),
+}
+
+
+def market_hours(timezone_name: str):
+    return MARKET_HOURS.get(timezone_name)
+
+
+def _local_now(timezone_name: str, now: datetime = None):
+    zone = ZoneInfo(timezone_name)
+    return (now or datetime.now(zone)).astimezone(zone)
+
+
+def is_market_open(timezone_name: str, now: datetime = None):
+    # None when the exchange is not in the table
+    hours = market_hours(timezone_name)
+    if hours is None:
+        return None
+    open_time, close_time, weekdays = hours
+    local = _local_now(timezone_name, now)
+    return local.weekday() in weekdays and open_time <= local.time() < close_time
+
+
+def seconds_until_open(timezone_name: str, now: datetime = None):
+    # Seconds until the next regular session starts, 0 while it is open, None when unknown
+    hours = market_hours(timezone_name)
+    if hours is None:
+        return None
+    open_time, close_time, weekdays = hours
+    local = _local_now(timezone_name, now)
+    if local.weekday() in weekdays and open_time <= local.time() < close_time:
+        return 0
+
+    zone = local.tzinfo
+    for days in range(8):
+        day = (local + timedelta(days=days)).date()
+        if day.weekday() not in weekdays:
+            continue
+        opens = datetime.combine(day, open_time, tzinfo=zone)
+        if opens > local:
+            # Through timestamps, so a DST change in between is accounted for
+            return opens.timestamp() - local.timestamp()
+    return None
+
+
+def last_session(timezone_name: str, now: datetime = None):
+    # (open, close) unix timestamps of the regular session in progress or the latest one, None when unknown
+    hours = market_hours(timezone_name)
+    if hours is None:
+        return None
+    open_time, close_time, weekdays = hours
+    local = _local_now(timezone_name, now)
+
+    zone = local.tzinfo
+    for days in range(8):
+        day = (local - timedelta(days=days)).date()
+        if day.weekday() not in weekdays:
+            continue
+        opens = datetime.combine(day, open_time, tzinfo=zone)
+        if opens <= local:
+            return int(opens.timestamp()), int(datetime.combine(day, close_time, tzinfo=zone).timestamp())
+    return None
+
+
+def seconds_since_close(timezone_name: str, now: datetime = None):
+    # Seconds since the latest regular session closed, 0 while it is open, None when unknown
+    session = last_session(timezone_name, now)
+    if session is None:
+        return None
+    return max(0.0, (now or datetime.now(timezone.utc)).timestamp() - session[1])
@@ -0,0 +1,61 @@
+from config import DATA_DIR, METADATA_TTL
+from datetime import datetime
+from zoneinfo import ZoneInfo
+import yfinance as yf
+import os
+from store import PersistentStore
+
+METADATA_STORE_PATH = os.path.join(DATA_DIR, "symbols.db")
+
+# symbol -> {"name", "exchange", "timezone", "gmtoffset"}
+_metadata = PersistentStore("symbol_metadata")
+
+
+def load_metadata_store(path: str = None):
+    return _metadata.load(path or METADATA_STORE_PATH)
+
+
+def _expired(symbol: str):
+    age = _metadata.age(symbol)
+    return age is None or age > METADATA_TTL * 24 * 60 * 60
+
+
+def offer_info(symbol: str, info: dict):
+    # A ticker.info fetched for other reasons (e.g. quotes) fills in missing or expired metadata for free
+    if _expired(symbol):
+        update_from_info(symbol, info)
+
+
+def update_from_info(symbol: str, info: dict):
+    metadata = {
+        "name": info.get('longName', info.get('shortName', symbol)),
+        "exchange": info.get('fullExchangeName', info.get('exchange')),
+        "timezone": info.get('exchangeTimezoneName'),
+        "gmtoffset": int(info.get('gmtOffSetMilliseconds', 0) / 1000)
+    }
+    _metadata.set(symbol, metadata)
+    return metadata
+
+
+def get_metadata(symbol: str):
+    # Stored metadata is served right away; once older than METADATA_TTL it is
+    # refreshed in the background. Only unknown symbols wait for ticker.info.
+    metadata = _metadata.get(symbol)
+    if metadata is None:
+        return update_from_info(symbol, yf.Ticker(symbol).info)
+
+    if _expired(symbol):
+        _metadata.refresh_async(symbol, lambda: update_from_info(symbol, yf.Ticker(symbol).info))
+    return metadata
+
+
+def utc_offset(metadata: dict, now: datetime = None):
+    # Current offset of the exchange's timezone in seconds, so DST changes since the
+    # metadata was stored are picked up
+    if metadata.get("timezone"):
+        try:
+            zone = ZoneInfo(metadata["timezone"])
+            return int((now or datetime.now(zone)).astimezone(zone).utcoffset().total_seconds())
+        except (KeyError, ValueError):
+            pass
+    return metadata["gmtoffset"]
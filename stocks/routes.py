@@ -1,20 +1,34 @@
 from config import app
 import stocks.helpers
-from flask import render_template, request
+import stocks.metadata
+from flask import render_template, request, jsonify
+from xml.parsers import expat
+
+with app.app_context():
+    stocks.metadata.load_metadata_store()
+    stocks.helpers.periodic_quote_prefetch()
 
 @app.route("/dgw", methods=["POST"])
 @app.route("/getstocks", methods=["POST"])
 def getstocks():
-    body = stocks.helpers.request_to_dict(request.get_data(as_text=True)[:-1])
-    request_type = body["request"]["query"]["type"]
+    try:
+        query = stocks.helpers.parse_query(request.get_data()[:-1])
+    except expat.ExpatError as e:
+        print(f"Malformed stocks request: {e}")
+        return "Malformed request", 400
+    request_type = query["type"]
     print(request_type)
 
     match request_type:
         case "getquotes":
-            return stocks.helpers.get_quotes([y for (x, y) in body["request"]["query"]["list"]])
+            return stocks.helpers.get_quotes(query["list"])
         case "getsymbol":
-            return stocks.helpers.get_symbols(body["request"]["query"]["phrase"], int(body["request"]["query"]["count"]), int(body["request"]["query"]["offset"]))
+            return stocks.helpers.get_symbols(query["phrase"], int(query["count"]), int(query["offset"]))
         case "getchart":
-            return stocks.helpers.get_chart(body["request"]["query"]["symbol"], body["request"]["query"]["range"])
+            return stocks.helpers.get_chart(query["symbol"], query["range"])
+
+    return "Not implemented", 501
 
-    return "Not implemented", 501
\ No newline at end of file
+@app.route("/stocks/stats")
+def stockstats():
+    return jsonify(stocks.helpers.cache_stats())
@@ -0,0 +1,72 @@
+from markupsafe import escape
+
+# Writers for the stock responses, producing exactly what stockquotes.xml,
+# stocksymbols.xml and stockchart.xml render to (same whitespace, same
+# autoescaping) without going through Jinja. Keep them in sync with the templates.
+
+_QUOTES_HEAD = '<?xml version="1.0" encoding="UTF-8"?>\n<response>\n    <result>\n        <list count="%d">\n            '
+_QUOTES_TAIL = '\n        </list>\n    </result>\n</response>'
+_QUOTE = (
+    '\n            <quote>'
+    '\n                <name>%s</name>'
+    '\n                <symbol>%s</symbol>'
+    '\n                <timestamp>%s</timestamp>'
+    '\n                <link>%s</link>'
+    '\n                <price>%s</price>'
+    '\n                <change>%s</change>'
+    '\n                <changepercent>%s</changepercent>'
+    '\n                <open>%s</open>'
+    '\n                <high>%s</high>'
+    '\n                <low>%s</low>'
+    '\n                <volume>%s</volume>'
+    '\n            </quote>\n            '
+)
+_SYMBOL = (
+    '\n            <quote>'
+    '\n                <name>%s</name>'
+    '\n                <symbol>%s</symbol>'
+    '\n            </quote>\n            '
+)
+_CHART_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n<response>\n  <result>\n    <list count="%d">'
+    '\n      <meta>'
+    '\n        <symbol>%s</symbol>'
+    '\n        <marketopen>%s</marketopen>'
+    '\n        <marketclose>%s</marketclose>'
+    '\n        <gmtoffset>%s</gmtoffset>'
+    '\n        <applicationData>%s</applicationData>'
+    '\n      </meta>\n      '
+)
+_CHART_TAIL = '\n    </list>\n  </result>\n</response>'
+_POINT = '\n      <point close="%s" timestamp="%s" />\n      '
+
+
+def quotes_xml(quotes) -> str:
+    parts = [_QUOTES_HEAD % len(quotes)]
+    for quote in quotes:
+        change = quote['change']
+        parts.append(_QUOTE % (
+            escape(quote['name']), escape(quote['symbol']), escape(quote['timestamp']), escape(quote['link']),
+            escape(quote['price']), escape(change['value']), escape(change['percent']), escape(quote['open']),
+            escape(quote['high']), escape(quote['low']), escape(quote['volume'])
+        ))
+    parts.append(_QUOTES_TAIL)
+    return "".join(parts)
+
+
+def symbols_xml(quotes) -> str:
+    parts = [_QUOTES_HEAD % len(quotes)]
+    for quote in quotes:
+        parts.append(_SYMBOL % (escape(quote['name']), escape(quote['symbol'])))
+    parts.append(_QUOTES_TAIL)
+    return "".join(parts)
+
+
+def chart_xml(symbol: dict, closes, timestamps) -> str:
+    # closes and timestamps are the formatted numbers from stocks.charts.chart_points,
+    # which never contain characters that need escaping
+    head = _CHART_HEAD % (
+        len(closes), escape(symbol['name']), escape(symbol['marketopen']), escape(symbol['marketclose']),
+        escape(symbol['gmtoffset']), escape(symbol['application_data'])
+    )
+    return head + "".join(map(_POINT.__mod__, zip(closes, timestamps))) + _CHART_TAIL
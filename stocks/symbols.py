@@ -0,0 +1,73 @@
+import bisect
+import threading
+
+
+def normalize_phrase(phrase: str) -> str:
+    return " ".join(phrase.lower().split())
+
+
+def _terms(symbol: str, name: str):
+    # The symbol itself and the name starting at each of its words, so
+    # "app" finds "Apple Inc." and "bank" finds "Bank of America" and "Deutsche Bank AG"
+    words = normalize_phrase(name).split()
+    terms = {symbol.lower()}
+    for i in range(len(words)):
+        terms.add(" ".join(words[i:]))
+    return terms
+
+
+class SymbolIndex:
+    # Sorted (term, symbol) pairs of every symbol seen in search results and
+    # quotes, for prefix lookups with bisect
+
+    def __init__(self):
+        self._entries = []
+        self._names = {}
+        self._lock = threading.Lock()
+
+    def add(self, symbol: str, name: str):
+        if not symbol or symbol == "N/A":
+            return
+        name = name or symbol
+        with self._lock:
+            old_name = self._names.get(symbol)
+            if old_name == name:
+                return
+            if old_name is not None:
+                for term in _terms(symbol, old_name):
+                    i = bisect.bisect_left(self._entries, (term, symbol))
+                    if i < len(self._entries) and self._entries[i] == (term, symbol):
+                        del self._entries[i]
+            self._names[symbol] = name
+            for term in _terms(symbol, name):
+                bisect.insort(self._entries, (term, symbol))
+
+    def search(self, phrase: str, limit: int):
+        # Exact symbol first, then symbols, then names starting with the
+        # phrase, then names with a later word starting with it
+        phrase = normalize_phrase(phrase)
+        if not phrase:
+            return []
+
+        ranks = {}
+        with self._lock:
+            i = bisect.bisect_left(self._entries, (phrase,))
+            while i < len(self._entries) and self._entries[i][0].startswith(phrase):
+                term, symbol = self._entries[i]
+                name = self._names[symbol]
+                if term == symbol.lower():
+                    rank = 0 if term == phrase else 1
+                elif normalize_phrase(name).startswith(term):
+                    rank = 2
+                else:
+                    rank = 3
+                ranks[symbol] = min(rank, ranks.get(symbol, rank))
+                i += 1
+            names = {symbol: self._names[symbol] for symbol in ranks}
+
+        ordered = sorted(ranks, key=lambda symbol: (ranks[symbol], len(symbol), symbol))
+        return [{'name': names[symbol], 'symbol': symbol} for symbol in ordered[:limit]]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._names)
@@ -0,0 +1,113 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class PersistentStore:
+    # Thread-safe key/value store mirrored to a SQLite table so it survives
+    # restarts. Keys are strings, values anything json can encode, and every
+    # entry remembers when it was set.
+    #
+    # load() reads the whole table into memory, after which get/set work from
+    # memory and write through. Stores too big to keep in memory use read/write,
+    # which go to the database only.
+
+    def __init__(self, table, path=None):
+        self.table = table
+        self.path = path
+        self._data = {}
+        self._lock = threading.Lock()
+        self._refreshing = set()
+
+    def open(self, path=None):
+        self.path = path or self.path
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with sqlite3.connect(self.path) as conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                         "key TEXT PRIMARY KEY, value TEXT NOT NULL, updated REAL NOT NULL)")
+
+    def load(self, path=None):
+        self.open(path)
+        with sqlite3.connect(self.path) as conn:
+            rows = conn.execute(f"SELECT key, value, updated FROM {self.table}").fetchall()
+        with self._lock:
+            for key, value, updated in rows:
+                self._data[key] = (json.loads(value), updated)
+        return len(rows)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+        return default if entry is None else entry[0]
+
+    def age(self, key):
+        # Seconds since the entry was set, None when missing
+        with self._lock:
+            entry = self._data.get(key)
+        return None if entry is None else time.time() - entry[1]
+
+    def set(self, key, value):
+        updated = time.time()
+        with self._lock:
+            self._data[key] = (value, updated)
+        self.write(key, value, updated)
+
+    def read(self, key):
+        # (value, updated) straight from the database, None when missing or unreadable
+        try:
+            with sqlite3.connect(self.path) as conn:
+                row = conn.execute(f"SELECT value, updated FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"Failed to read {key} from {self.table}: {e}")
+            return None
+        return None if row is None else (json.loads(row[0]), row[1])
+
+    def write(self, key, value, updated=None):
+        try:
+            with sqlite3.connect(self.path) as conn:
+                conn.execute(f"INSERT OR REPLACE INTO {self.table} (key, value, updated) VALUES (?, ?, ?)",
+                             (key, json.dumps(value), time.time() if updated is None else updated))
+        except sqlite3.Error as e:
+            print(f"Failed to persist {key} in {self.table}: {e}")
+
+    def prune(self, max_age):
+        # Deletes entries set more than max_age seconds ago from the database
+        try:
+            with sqlite3.connect(self.path) as conn:
+                conn.execute(f"DELETE FROM {self.table} WHERE updated < ?", (time.time() - max_age,))
+        except sqlite3.Error as e:
+            print(f"Failed to prune {self.table}: {e}")
+
+    def refresh_async(self, key, refresh):
+        # Runs refresh() in the background unless a refresh of this key is already in flight
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                refresh()
+            except Exception as e:
+                print(f"Refreshing {key} in {self.table} failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        t = threading.Thread(target=run, daemon=True)
+        t.start()
+
+    def clear(self):
+        # Forgets what is in memory; the database is left alone
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
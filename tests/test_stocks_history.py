@@ -0,0 +1,100 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import stocks.history
+
+DAY = 24 * 60 * 60
+# An exchange at UTC-5, whose daily bars Yahoo stamps at 05:00 UTC
+OFFSET = -5 * 60 * 60
+FIRST_BAR = int(pd.Timestamp("2014-01-02 05:00", tz="UTC").timestamp())
+NOW = int(pd.Timestamp("2024-03-15 20:00", tz="UTC").timestamp())
+LAST_BAR = NOW - 15 * 60 * 60
+
+
+class FakeTicker:
+    calls = []
+    dividends = {}
+    now = NOW
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+
+    def history(self, period=None, start=None, interval="1d"):
+        FakeTicker.calls.append(period or start)
+        first = FIRST_BAR if period == "max" else start
+        ts = [t for t in range(FIRST_BAR, FakeTicker.now + 1, DAY) if t >= first]
+        return pd.DataFrame({"Close": [t / DAY for t in ts],
+                             "Dividends": [FakeTicker.dividends.get(t, 0.0) for t in ts],
+                             "Stock Splits": 0.0},
+                            index=pd.to_datetime(ts, unit="s", utc=True))
+
+
+@pytest.fixture(autouse=True)
+def fake_upstream(monkeypatch, tmp_path):
+    monkeypatch.setattr(stocks.history.yf, "Ticker", FakeTicker)
+    monkeypatch.setattr(stocks.history, "HISTORY_DIR", str(tmp_path))
+    monkeypatch.setattr(time, "time", lambda: FakeTicker.now)
+    FakeTicker.calls, FakeTicker.dividends, FakeTicker.now = [], {}, NOW
+
+
+def range_start_utc(chart_range):
+    start = stocks.history.range_start(chart_range, NOW, OFFSET)
+    return pd.Timestamp(start, unit="s").strftime("%Y-%m-%d %H:%M")
+
+
+def test_range_start_is_local_midnight():
+    assert range_start_utc("1y") == "2023-03-15 05:00"
+    assert range_start_utc("3m") == "2023-12-15 05:00"
+    assert range_start_utc("ytd") == "2024-01-01 05:00"
+    assert stocks.history.range_start("max", NOW, OFFSET) == 0
+    assert stocks.history.range_start("soon", NOW, OFFSET) is None
+
+    bars = np.array([(FIRST_BAR, 1.0)], dtype=stocks.history.BAR_DTYPE)
+    assert stocks.history.utc_offset(bars) == OFFSET
+    # East of UTC, local midnight is the previous day in UTC
+    bars["ts"] -= 14 * 60 * 60
+    assert stocks.history.utc_offset(bars) == 9 * 60 * 60
+
+
+def test_stored_bars_are_reused_and_topped_up():
+    year = stocks.history.get_bars("T", "1y")
+    assert len(FakeTicker.calls) == 1
+    assert year["ts"][0] == stocks.history.range_start("1y", NOW, OFFSET)
+    assert year["ts"][-1] == LAST_BAR
+
+    # A shorter range is sliced from the stored bars
+    months = stocks.history.get_bars("T", "3m")
+    assert len(FakeTicker.calls) == 1
+    assert months["ts"][0] == stocks.history.range_start("3m", NOW, OFFSET)
+    assert np.array_equal(months, year[-len(months):])
+
+    # Once the refresh interval has passed, only bars from the last stored one on are fetched
+    FakeTicker.now += DAY
+    months = stocks.history.get_bars("T", "3m")
+    assert FakeTicker.calls[1:] == [LAST_BAR - DAY]
+    assert months["ts"][-1] == LAST_BAR + DAY
+    stored = stocks.history.load_bars("T")
+    assert (np.diff(stored["ts"]) == DAY).all()
+
+    # Ranges reaching further back than the stored bars refetch them
+    stocks.history.get_bars("T", "5y")
+    assert FakeTicker.calls[2:] == [stocks.history.range_start("5y") - DAY]
+    full = stocks.history.get_bars("T", "max")
+    assert FakeTicker.calls[3:] == ["max"]
+    assert full["ts"][0] == FIRST_BAR
+    stocks.history.get_bars("T", "1y")
+    assert len(FakeTicker.calls) == 4
+
+
+def test_dividend_in_new_bars_refetches_the_stored_span():
+    stocks.history.get_bars("T", "1y")
+    start = FakeTicker.calls[0]
+    # Yahoo re-adjusts every earlier close after a dividend
+    FakeTicker.now += DAY
+    FakeTicker.dividends[LAST_BAR + DAY] = 0.5
+    bars = stocks.history.get_bars("T", "1y")
+    assert FakeTicker.calls[1:] == [LAST_BAR - DAY, start]
+    assert bars["ts"][-1] == LAST_BAR + DAY
@@ -0,0 +1,37 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+
+import stocks.helpers
+import stocks.markets
+from config import QUOTE_CACHE_TTL, QUOTE_CACHE_CLOSED_TTL
+
+NEW_YORK = ZoneInfo("America/New_York")
+CLOSED = {"marketState": "POSTPOST", "exchangeTimezoneName": "America/New_York"}
+
+
+def at(*args):
+    return datetime(*args, tzinfo=NEW_YORK)
+
+
+def test_seconds_since_close():
+    assert stocks.markets.seconds_since_close("America/New_York", at(2026, 10, 16, 12, 0)) == 0
+    assert stocks.markets.seconds_since_close("America/New_York", at(2026, 10, 16, 16, 5)) == 300
+    assert stocks.markets.seconds_since_close("Unknown/Zone", at(2026, 10, 16, 16, 5)) is None
+
+
+@pytest.mark.parametrize("minute", [0, 1, 14])
+def test_quotes_right_after_the_close_keep_the_short_ttl(minute):
+    # Friday, the next session is on Monday
+    assert stocks.helpers.quote_ttl(CLOSED, at(2026, 10, 16, 16, minute)) == QUOTE_CACHE_TTL
+
+
+def test_quotes_after_the_grace_window_last_until_the_next_open():
+    ttl = stocks.helpers.quote_ttl(CLOSED, at(2026, 10, 16, 16, 20))
+    assert ttl == (at(2026, 10, 19, 9, 30) - at(2026, 10, 16, 16, 20)).total_seconds()
+
+
+def test_closed_during_session_hours_uses_the_closed_ttl():
+    # Open by the table but not according to Yahoo, e.g. a holiday
+    assert stocks.helpers.quote_ttl(CLOSED, at(2026, 10, 16, 12, 0)) == QUOTE_CACHE_CLOSED_TTL
@@ -0,0 +1,55 @@
+import os
+import tempfile
+
+import pytest
+
+from config import app
+import stocks.helpers
+import stocks.metadata
+from benchmarks.stocks_parser_bench import PAYLOADS, body
+
+# No background work or writes to the real data directory while testing
+stocks.helpers.periodic_quote_prefetch = lambda *args, **kwargs: None
+stocks.metadata.METADATA_STORE_PATH = os.path.join(tempfile.mkdtemp(prefix="stocks-tests-"), "symbols.db")
+
+import stocks.routes
+
+BODIES = dict(PAYLOADS, **{
+    "escaped phrase": body('<query id="0" timestamp="1760000000" type="getsymbol">'
+                           '<phrase>AT&amp;T</phrase><count>20</count><offset>0</offset></query>'),
+    "whitespace": body('\n  <query id="0" timestamp="1760000000" type="getquotes">\n    <list>\n'
+                       '      <symbol> AAPL </symbol>\n      <symbol>2330.TW</symbol>\n    </list>\n  </query>\n'),
+    "empty list": body('<query id="0" timestamp="1760000000" type="getquotes"><list/></query>'),
+})
+FIELDS = ("type", "list", "phrase", "count", "offset", "symbol", "range")
+
+
+def from_tree(payload):
+    # What getstocks read from request_to_dict before parse_query
+    query = stocks.helpers.request_to_dict(payload.decode("utf-8")[:-1])["request"]["query"]
+    if "list" in query:
+        query["list"] = [text for _, text in query["list"]]
+    return {field: query[field] for field in FIELDS if field in query}
+
+
+@pytest.mark.parametrize("name", BODIES)
+def test_parse_query_reads_what_request_to_dict_did(name):
+    payload = BODIES[name]
+    expected = from_tree(payload)
+    query = stocks.helpers.parse_query(payload[:-1])
+    assert {field: query[field] for field in expected} == expected
+    if "list" not in expected:
+        assert query["list"] == []
+
+
+def test_escaped_phrase_and_empty_list():
+    assert stocks.helpers.parse_query(BODIES["escaped phrase"][:-1])["phrase"] == "AT&T"
+    assert stocks.helpers.parse_query(BODIES["whitespace"][:-1])["list"] == ["AAPL", "2330.TW"]
+    assert stocks.helpers.parse_query(BODIES["empty list"][:-1])["list"] == []
+
+
+@pytest.mark.parametrize("url", ["/getstocks", "/dgw"])
+def test_malformed_body_is_a_bad_request(url):
+    truncated = body('<query id="0" timestamp="1760000000" type="getchart"><symbol>AAPL</symbol>')
+    response = app.test_client().post(url, data=truncated.replace(b"</request>", b""))
+    assert response.status_code == 400
@@ -0,0 +1,44 @@
+import pytest
+
+import stocks.helpers
+from config import QUOTE_PREFETCH_MIN_REQUESTS
+
+
+@pytest.fixture(autouse=True)
+def fake_yahoo(monkeypatch):
+    fetched = []
+
+    def fetch_quote(symbol):
+        fetched.append(symbol)
+        if symbol == "BOGUS":
+            raise Exception(f"Error fetching data for {symbol}: 404")
+        return {'symbol': symbol, 'name': symbol}, 60
+
+    monkeypatch.setattr(stocks.helpers, "_fetch_quote", fetch_quote)
+    monkeypatch.setattr(stocks.helpers.stocks.metadata, "offer_info", lambda symbol, info: None)
+    stocks.helpers._quote_cache.clear()
+    with stocks.helpers._quote_popularity_lock:
+        stocks.helpers._quote_popularity.clear()
+    return fetched
+
+
+def request(symbols, times=1):
+    for _ in range(times):
+        stocks.helpers.fetch_quotes(symbols)
+        stocks.helpers._quote_cache.clear()
+
+
+def test_rarely_requested_symbols_are_not_prefetched(fake_yahoo):
+    request(["AAPL"], times=QUOTE_PREFETCH_MIN_REQUESTS)
+    request(["ONCE"])
+    fake_yahoo.clear()
+    stocks.helpers.refresh_popular_quotes(horizon=0)
+    assert fake_yahoo == ["AAPL"]
+
+
+def test_symbols_whose_refresh_failed_are_dropped(fake_yahoo):
+    request(["AAPL", "BOGUS"], times=QUOTE_PREFETCH_MIN_REQUESTS)
+    assert "BOGUS" not in stocks.helpers._quote_popularity
+    fake_yahoo.clear()
+    stocks.helpers.refresh_popular_quotes(horizon=0)
+    assert fake_yahoo == ["AAPL"]
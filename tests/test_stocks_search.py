@@ -0,0 +1,71 @@
+import pytest
+
+import stocks.helpers
+import stocks.symbols
+
+YAHOO = [("AAPL", "Apple Inc."), ("AAPL.MX", "Apple Inc."), ("APLE", "Apple Hospitality REIT, Inc."),
+         ("APP", "AppLovin Corporation"), ("SAP.DE", "SAP SE")]
+
+
+class FakeSearch:
+    calls = 0
+
+    def __init__(self, query, max_results=8, **kwargs):
+        FakeSearch.calls += 1
+        self.quotes = [{"symbol": symbol, "longname": name} for symbol, name in YAHOO[:max_results]]
+
+
+@pytest.fixture(autouse=True)
+def fresh_search(monkeypatch):
+    monkeypatch.setattr(stocks.helpers.yf, "Search", FakeSearch)
+    monkeypatch.setattr(stocks.helpers, "SEARCH_FETCH_SIZE", 2)
+    monkeypatch.setattr(stocks.helpers, "_symbol_index", stocks.symbols.SymbolIndex())
+    stocks.helpers._search_cache.clear()
+    FakeSearch.calls = 0
+
+
+def walk_pages(phrase, count):
+    symbols = []
+    for offset in range(0, 2 * len(YAHOO), count):
+        page = stocks.helpers.search_symbols(phrase, offset + count)[offset:offset + count]
+        symbols.extend(result["symbol"] for result in page)
+        if len(page) < count:
+            break
+    return symbols
+
+
+@pytest.mark.parametrize("count", [1, 2, 3])
+def test_pages_from_yahoo_have_no_duplicates_or_gaps(count):
+    assert walk_pages("ap", count) == [symbol for symbol, _ in YAHOO]
+
+
+@pytest.mark.parametrize("count", [1, 2, 3])
+def test_pages_from_the_local_index_have_no_duplicates_or_gaps(count):
+    # Symbols seen before answer the phrase locally, in the index's own order, and
+    # Yahoo adds what the index does not know once its matches run out
+    for symbol, name in YAHOO:
+        stocks.helpers._symbol_index.add(symbol, name)
+    local = [result["symbol"] for result in stocks.helpers._symbol_index.search("ap", len(YAHOO))]
+    expected = local + [symbol for symbol, _ in YAHOO if symbol not in local]
+    assert walk_pages("ap", count) == expected
+    assert FakeSearch.calls > 0
+
+
+def test_paging_past_the_local_index_asks_yahoo():
+    for symbol, name in [("AAPL", "Apple Inc."), ("APLE", "Apple Hospitality REIT, Inc."), ("APP", "AppLovin Corporation")]:
+        stocks.helpers._symbol_index.add(symbol, name)
+    first = stocks.helpers.search_symbols("ap", 2)
+    assert FakeSearch.calls == 0
+    results = stocks.helpers.search_symbols("ap", 4)
+    assert FakeSearch.calls == 1
+    assert results[:2] == first
+    assert sorted(result["symbol"] for result in results) == ["AAPL", "AAPL.MX", "APLE", "APP"]
+
+
+def test_index_growing_between_pages_does_not_mix_sources():
+    # The first pages come from Yahoo and fill the index; later pages of the same
+    # phrase must keep Yahoo's order even though the index could now answer them
+    first = stocks.helpers.search_symbols("ap", 2)
+    rest = stocks.helpers.search_symbols("ap", 6)[2:]
+    symbols = [result["symbol"] for result in first + rest]
+    assert symbols == [symbol for symbol, _ in YAHOO]
@@ -0,0 +1,47 @@
+import os
+import threading
+
+from store import PersistentStore
+
+
+def test_entries_survive_a_restart(tmp_path):
+    path = os.path.join(tmp_path, "store.db")
+    store = PersistentStore("things")
+    assert store.load(path) == 0
+    store.set("a|b", {"lat": 1.5, "name": "A"})
+    assert store.get("a|b") == {"lat": 1.5, "name": "A"}
+    assert 0 <= store.age("a|b") < 5
+
+    reopened = PersistentStore("things")
+    assert reopened.load(path) == 1
+    assert "a|b" in reopened
+    assert reopened.get("a|b") == {"lat": 1.5, "name": "A"}
+    assert reopened.read("a|b")[0] == {"lat": 1.5, "name": "A"}
+    assert reopened.get("missing") is None and reopened.age("missing") is None
+
+
+def test_prune_drops_old_entries_from_the_database(tmp_path):
+    store = PersistentStore("things")
+    store.open(os.path.join(tmp_path, "store.db"))
+    store.write("old", 1, updated=0)
+    store.write("new", 2)
+    store.prune(60)
+    assert store.read("old") is None
+    assert store.read("new")[0] == 2
+
+
+def test_refresh_async_runs_one_refresh_per_key_at_a_time(tmp_path):
+    store = PersistentStore("things", os.path.join(tmp_path, "store.db"))
+    release, done = threading.Event(), threading.Event()
+    runs = []
+
+    def refresh():
+        runs.append(1)
+        release.wait(5)
+        done.set()
+
+    store.refresh_async("key", refresh)
+    store.refresh_async("key", refresh)
+    release.set()
+    assert done.wait(5)
+    assert runs == [1]
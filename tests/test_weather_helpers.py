@@ -0,0 +1,21 @@
+import numpy as np
+
+import weather.helpers
+
+
+def test_weather_conditions_match_the_scalar_version_including_nulls():
+    codes = [0, 3, 61, 95, None, 4, -1, 250, 2.5]
+    for is_day in (True, False):
+        icons, texts = weather.helpers.weather_conditions(codes, is_day)
+        expected = [weather.helpers.get_weather_condition(code, is_day) for code in codes]
+        assert list(zip(icons.tolist(), texts.tolist())) == expected
+
+
+def test_compass_directions_leave_missing_directions_blank():
+    directions = weather.helpers.compass_directions([0, 90, 180, 350, None, np.nan]).tolist()
+    assert directions == ["N", "E", "S", "N", "", ""]
+    assert directions[:4] == [weather.helpers.get_compass_direction(d) for d in (0, 90, 180, 350)]
+
+
+def test_round_all_turns_missing_values_into_zero():
+    assert weather.helpers.round_all([0.5, 1.5, -2.5, 21.7, None, np.nan]) == [0, 2, -2, 22, 0, 0]
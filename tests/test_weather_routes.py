@@ -0,0 +1,113 @@
+import concurrent.futures
+import json
+import os
+import re
+import tempfile
+import time
+
+import pytest
+from flask import render_template
+
+from config import app
+import weather.helpers
+import weather.locations
+
+# No background work or writes to the real data directory while testing
+weather.locations.prewarm_location_index = lambda *args, **kwargs: None
+weather.helpers.periodic_forecast_refresh = lambda *args, **kwargs: None
+weather.locations.LOCATION_INDEX_PATH = os.path.join(tempfile.mkdtemp(prefix="weather-tests-"), "locations.db")
+
+import weather.routes
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "fixtures", "weather", "taipei")
+TAIPEI = {"lat": 25.0478, "lon": 121.5319, "city": "Taipei", "country": "Taiwan"}
+LEGACY_URLS = ["/getstaticweather", "/forecast-data_v3.asp", "/widget/htc/forecast-data_v3.asp"]
+HTC2_URL = "/widget/htc2/weather-data.asp"
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name + ".json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    upstream = []
+
+    def fetch_open_meteo(lat, lon, profile="legacy", *args, **kwargs):
+        upstream.append(profile)
+        return fixture("open_meteo_htc2" if profile == "htc2" else "open_meteo_daily")
+
+    monkeypatch.setattr(weather.locations, "lookup_location", lambda city, country: TAIPEI)
+    monkeypatch.setattr(weather.helpers, "fetch_open_meteo", fetch_open_meteo)
+    weather.helpers._forecast_cache.clear()
+    weather.routes._rendered_cache.clear()
+    test_client = app.test_client()
+    test_client.upstream = upstream
+    return test_client
+
+
+def count_renders(monkeypatch):
+    renders = []
+    render_template = weather.routes.render_template
+
+    def counting(name, **context):
+        renders.append(name)
+        return render_template(name, **context)
+    monkeypatch.setattr(weather.routes, "render_template", counting)
+    return renders
+
+
+def test_htc2_url_serves_the_htc2_feed_with_etag(client, monkeypatch):
+    renders = count_renders(monkeypatch)
+    url = HTC2_URL + "?locCode=ASI|TW|TW018|TAIPEI&metric=1"
+    first = client.get(url)
+    assert first.status_code == 200
+    assert b"htc2 feed" in first.data
+    assert first.headers["ETag"]
+    assert client.upstream == ["htc2"]
+
+    again = client.get(url)
+    assert again.data == first.data
+    not_modified = client.get(url, headers={"If-None-Match": first.headers["ETag"]})
+    assert not_modified.status_code == 304
+    assert renders == ["weatherV3.xml"]
+
+
+@pytest.mark.parametrize("url", LEGACY_URLS)
+def test_legacy_urls_reuse_the_render_with_a_current_local_time(client, monkeypatch, url):
+    renders = count_renders(monkeypatch)
+    first = client.get(url + "?locCode=ASI|TW|TW018|TAIPEI").get_data(as_text=True)
+    second = client.get(url + "?locCode=ASI|TW|TW018|TAIPEI").get_data(as_text=True)
+    assert renders == ["weather.xml"]
+    assert client.upstream == ["legacy"]
+    assert "htc2 feed" not in first
+
+    local_times = re.findall(r"<localTime>([^<]*)</localTime>", first + second)
+    assert len(local_times) == 2
+    assert all(re.fullmatch(r"\d{4}-\d\d-\d\d \d\d:\d\d:\d\d [AP]M", t) for t in local_times)
+
+    # Same bytes as rendering the template directly with that local time
+    forecast = weather.helpers.get_forecast(TAIPEI["lat"], TAIPEI["lon"], "legacy")
+    with app.test_request_context():
+        expected = render_template("weather.xml", city=TAIPEI["city"], country=TAIPEI["country"], datentime=local_times[0],
+                                   current=forecast.legacy_current(), days=forecast.legacy_days())
+    assert first == expected
+
+
+def test_upstream_deadline_bounds_queued_calls(monkeypatch):
+    # A call queued behind a slow one gives up at its request's deadline and never runs
+    monkeypatch.setattr(weather.routes, "_upstream_executor", concurrent.futures.ThreadPoolExecutor(max_workers=1))
+    ran = []
+    deadline = time.monotonic() + 0.2
+    slow = weather.routes._UpstreamCall(deadline, time.sleep, 0.5)
+    queued = weather.routes._UpstreamCall(deadline, lambda: ran.append("forecast"))
+    started = time.monotonic()
+    assert queued.result() is None
+    assert time.monotonic() - started < 0.4
+    assert slow.result() is None
+    time.sleep(0.5)
+    assert ran == []
+
+    fast = weather.routes._UpstreamCall(time.monotonic() + 0.2, lambda: "forecast")
+    assert fast.result() == "forecast"
@@ -0,0 +1,21 @@
+import youtube.helpers
+from config import YOUTUBE_STATISTICS_CACHE_TTL, YOUTUBE_CHANNELS_CACHE_TTL, YOUTUBE_SEARCH_CACHE_TTL
+
+
+def test_channel_ids_are_cached_for_days():
+    assert youtube.helpers.api_cache_ttl("channels", {"part": "contentDetails", "id": "UC1"}) == YOUTUBE_CHANNELS_CACHE_TTL * 24 * 60 * 60
+    assert youtube.helpers.api_cache_ttl("search", {"part": "snippet", "type": "channel"}) == YOUTUBE_CHANNELS_CACHE_TTL * 24 * 60 * 60
+    assert youtube.helpers.api_cache_ttl("search", {"part": "snippet", "type": "video"}) == YOUTUBE_SEARCH_CACHE_TTL * 60 * 60
+
+
+def test_statistics_get_the_short_ttl_on_any_resource():
+    for resource in ("channels", "videos"):
+        params = {"part": "snippet, statistics,contentDetails", "id": "X"}
+        assert youtube.helpers.api_cache_ttl(resource, params) == YOUTUBE_STATISTICS_CACHE_TTL * 60
+
+
+def test_equivalent_parameters_share_a_key():
+    key = youtube.helpers.api_cache_key
+    assert key("videos", "list", {"part": "snippet,statistics", "id": "a"}) == key("videos", "list", {"id": "a", "part": "statistics, snippet"})
+    assert key("search", "list", {"q": "Foo  Bar"}) == key("search", "list", {"q": "foo bar"})
+    assert key("search", "list", {"q": "foo"}) != key("videos", "list", {"q": "foo"})
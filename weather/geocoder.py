@@ -0,0 +1,77 @@
+from config import OFFLINE_GEOCODER_ENABLED, OFFLINE_GEOCODER_FILE, OFFLINE_GEOCODER_RADIUS
+import weather.helpers
+import math
+import os
+
+EARTH_RADIUS_KM = 6371.0
+CELL_SIZE = 1.0 # Grid cell size in degrees
+
+# (lat cell, lon cell) -> [(lat, lon, city, country), ...]
+_grid = {}
+
+
+def _cell(lat: float, lon: float):
+    return int(math.floor(lat / CELL_SIZE)), int(math.floor(lon / CELL_SIZE))
+
+
+def load_gazetteer(path: str = OFFLINE_GEOCODER_FILE):
+    _grid.clear()
+    if not os.path.exists(path):
+        print(f"Offline geocoder gazetteer not found: {path}")
+        return 0
+
+    count = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            try:
+                lat, lon, city, country = line.rstrip("\n").split("\t")
+                lat, lon = float(lat), float(lon)
+            except ValueError:
+                print(f"Skipping malformed gazetteer line: {line.strip()}")
+                continue
+            _grid.setdefault(_cell(lat, lon), []).append((lat, lon, city, country))
+            count += 1
+    return count
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def nearest_city(lat: float, lon: float, max_distance_km: float = OFFLINE_GEOCODER_RADIUS):
+    if not _grid:
+        return None
+
+    lat_span = max_distance_km / 111.0
+    lon_span = lat_span / max(math.cos(math.radians(min(abs(lat) + lat_span, 89.0))), 0.01)
+    lat_cells = int(math.ceil(lat_span / CELL_SIZE))
+    lon_cells = min(int(math.ceil(lon_span / CELL_SIZE)), int(180 / CELL_SIZE))
+    lat_cell, lon_cell = _cell(lat, lon)
+    lon_cell_count = int(360 / CELL_SIZE)
+
+    best = None
+    best_distance = max_distance_km
+    for dlat in range(-lat_cells, lat_cells + 1):
+        for dlon in range(-lon_cells, lon_cells + 1):
+            # Wrap around the antimeridian
+            wrapped = (lon_cell + dlon + lon_cell_count // 2) % lon_cell_count - lon_cell_count // 2
+            for entry in _grid.get((lat_cell + dlat, wrapped), ()):
+                distance = haversine_km(lat, lon, entry[0], entry[1])
+                if distance <= best_distance:
+                    best, best_distance = entry, distance
+    return best
+
+
+def reverse_geocode(lat: float, lon: float):
+    # Answers from the bundled gazetteer when a city is close enough, otherwise asks Nominatim
+    if OFFLINE_GEOCODER_ENABLED:
+        entry = nearest_city(lat, lon)
+        if entry is not None:
+            return {"address": {"city": entry[2], "country": entry[3]}}
+    return weather.helpers.get_nominatim_reverse(lat, lon)
@@ -77,10 +77,34 @@ def get_weather_condition(weather_code, is_day):
 import requests
 import json
 import time
+from cache import TTLCache
+from config import GEOCODE_CACHE_PRECISION, GEOCODE_CACHE_TTL, GEOCODE_CACHE_SIZE
+
+NOMINATIM_URL = "https://nominatim.openstreetmap.org"
+OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+
+_reverse_cache = TTLCache(maxsize=GEOCODE_CACHE_SIZE, ttl=GEOCODE_CACHE_TTL * 24 * 60 * 60)
+
+
+def coordinate_cell(lat: float, lon: float, precision: int = GEOCODE_CACHE_PRECISION):
+    # Nearby coordinates share a cell, so phones in the same area reuse each other's results
+    return round(lat, precision), round(lon, precision)
 
 
 def get_nominatim_reverse(lat: float, lon: float, attempts: int = 3, timeout: int = 5):
-    nominatim_reverse_url = f"https://nominatim.openstreetmap.org/reverse?lat={lat}&lon={lon}&format=json&zoom=10&addressdetails=1"
+    cell = coordinate_cell(lat, lon)
+    cached = _reverse_cache.get(cell)
+    if cached is not None:
+        return cached
+
+    data = _fetch_nominatim_reverse(lat, lon, attempts, timeout)
+    if data is not None:
+        _reverse_cache.set(cell, data)
+    return data
+
+
+def _fetch_nominatim_reverse(lat: float, lon: float, attempts: int, timeout: int):
+    nominatim_reverse_url = f"{NOMINATIM_URL}/reverse?lat={lat}&lon={lon}&format=json&zoom=10&addressdetails=1"
     headers = {"User-Agent": "HTC HTTP Service"}
 
     for attempt in range(attempts):
@@ -97,7 +121,7 @@ def get_nominatim_reverse(lat: float, lon: float, attempts: int = 3, timeout: in
 
 def search_nominatim(city: str, country_code: str, attempts: int = 3, timeout: int = 5):
     q = f"{city},{country_code}"
-    nominatim_search_url = f"https://nominatim.openstreetmap.org/search?q={q}&format=json&limit=1&addressdetails=1"
+    nominatim_search_url = f"{NOMINATIM_URL}/search?q={q}&format=json&limit=1&addressdetails=1"
     headers = {"User-Agent": "HTC HTTP Service"}
 
     for attempt in range(attempts):
@@ -116,18 +140,185 @@ def search_nominatim(city: str, country_code: str, attempts: int = 3, timeout: i
             time.sleep(0.5)
 
 
-def fetch_open_meteo(lat: float, lon: float, forecast_days: int = 5, attempts: int = 3, timeout: int = 5):
-    daily_fields = "temperature_2m_max,temperature_2m_min,windspeed_10m_max,winddirection_10m_dominant,uv_index_max,weathercode,sunrise,sunset"
-    hourly_fields = "temperature_2m,windspeed_10m,winddirection_10m,weathercode,precipitation"
+import threading
+import weather.model
+from config import FORECAST_CACHE_PRECISION, FORECAST_CACHE_STALE, FORECAST_CACHE_SIZE
+from config import FORECAST_REFRESH_TOP, FORECAST_REFRESH_BATCH
+
+_forecast_cache = TTLCache(maxsize=FORECAST_CACHE_SIZE, ttl=60 * 60, stale_ttl=FORECAST_CACHE_STALE * 60 * 60)
+_forecast_refreshing = set()
+_forecast_refresh_lock = threading.Lock()
+
+# Request counts per forecast key, halved after every refresher run so old favourites fade out
+_forecast_popularity = {}
+_forecast_popularity_lock = threading.Lock()
+
+
+# What each consumer reads from Open-Meteo. The hourly window of the htc2 feed
+# (24 hours back and ahead of now) always contains the local day it renders.
+FORECAST_PROFILES = {
+    "latlon": {
+        "daily": ("temperature_2m_max", "temperature_2m_min", "windspeed_10m_max", "winddirection_10m_dominant", "uv_index_max", "weathercode"),
+        "hourly": (),
+        "days": 5
+    },
+    "legacy": {
+        "daily": ("temperature_2m_max", "temperature_2m_min", "windspeed_10m_max", "winddirection_10m_dominant", "uv_index_max", "weathercode"),
+        "hourly": (),
+        "days": 5
+    },
+    "htc2": {
+        "daily": ("temperature_2m_max", "temperature_2m_min", "windspeed_10m_max", "winddirection_10m_dominant", "uv_index_max", "weathercode", "sunrise", "sunset"),
+        "hourly": ("temperature_2m", "windspeed_10m", "winddirection_10m", "weathercode", "precipitation"),
+        "days": 9,
+        "past_hours": 24,
+        "forecast_hours": 24
+    }
+}
+
+
+def profile_covers(wider: str, narrower: str) -> bool:
+    # Whether a forecast fetched for one profile has everything another profile needs
+    a, b = FORECAST_PROFILES[wider], FORECAST_PROFILES[narrower]
+    if a["days"] < b["days"] or not set(b["daily"]) <= set(a["daily"]):
+        return False
+    if not b["hourly"]:
+        return True
+    return (set(b["hourly"]) <= set(a["hourly"])
+            and a.get("past_hours") == b.get("past_hours")
+            and a.get("forecast_hours") == b.get("forecast_hours"))
+
+
+def _forecast_ttl():
+    # Open-Meteo refreshes its models every hour, so a forecast is fresh until the next full hour
+    return 60 * 60 - (time.time() % (60 * 60))
+
+
+def get_forecast(lat: float, lon: float, profile: str = "legacy"):
+    lat, lon = coordinate_cell(lat, lon, FORECAST_CACHE_PRECISION)
+    key = (lat, lon, profile)
+    with _forecast_popularity_lock:
+        _forecast_popularity[key] = _forecast_popularity.get(key, 0) + 1
+
+    forecast, fresh = _forecast_cache.get_entry(key)
+    if forecast is None or not fresh:
+        # A wider profile cached for the same cell can answer too
+        for other in FORECAST_PROFILES:
+            if other == profile or not profile_covers(other, profile):
+                continue
+            wider, wider_fresh = _forecast_cache.get_entry((lat, lon, other))
+            if wider is not None and (wider_fresh or forecast is None):
+                forecast, fresh = wider, wider_fresh
+                if fresh:
+                    break
+
+    if forecast is None:
+        data = fetch_open_meteo(lat, lon, profile)
+        if data is None:
+            return None
+        forecast = weather.model.Forecast(data)
+        _forecast_cache.set(key, forecast, ttl=_forecast_ttl())
+        return forecast
+
+    if not fresh:
+        _refresh_forecast_async(key)
+    return forecast
+
+
+def _refresh_forecast_async(key):
+    with _forecast_refresh_lock:
+        if key in _forecast_refreshing:
+            return
+        _forecast_refreshing.add(key)
+
+    def run():
+        try:
+            lat, lon, profile = key
+            data = fetch_open_meteo(lat, lon, profile)
+            if data is not None:
+                _forecast_cache.set(key, weather.model.Forecast(data), ttl=_forecast_ttl())
+        finally:
+            with _forecast_refresh_lock:
+                _forecast_refreshing.discard(key)
+
+    t = threading.Thread(target=run, daemon=True)
+    t.start()
+
+
+def refresh_popular_forecasts(top: int = FORECAST_REFRESH_TOP, batch_size: int = FORECAST_REFRESH_BATCH):
+    with _forecast_popularity_lock:
+        popular = sorted(_forecast_popularity, key=_forecast_popularity.get, reverse=True)[:top]
+        for key in list(_forecast_popularity):
+            _forecast_popularity[key] /= 2
+            if _forecast_popularity[key] < 0.5:
+                del _forecast_popularity[key]
+
+    # Forecasts a request already refreshed since they expired are skipped, and the
+    # rest are marked in flight so requests in the meantime do not fetch them again
+    due = []
+    with _forecast_refresh_lock:
+        for key in popular:
+            ttl_left = _forecast_cache.ttl_left(key)
+            if key in _forecast_refreshing or (ttl_left is not None and ttl_left > 0):
+                continue
+            _forecast_refreshing.add(key)
+            due.append(key)
+
+    # Only locations using the same profile can share a request
+    by_profile = {}
+    for key in due:
+        by_profile.setdefault(key[2], []).append(key)
+
+    refreshed = 0
+    try:
+        for profile, keys in by_profile.items():
+            for i in range(0, len(keys), batch_size):
+                batch = keys[i:i + batch_size]
+                results = fetch_open_meteo_batch([(lat, lon) for lat, lon, _ in batch], profile)
+                if results is None:
+                    continue
+                ttl = _forecast_ttl()
+                for key, data in zip(batch, results):
+                    _forecast_cache.set(key, weather.model.Forecast(data), ttl=ttl)
+                    refreshed += 1
+    finally:
+        with _forecast_refresh_lock:
+            _forecast_refreshing.difference_update(due)
+    return refreshed
+
+
+def periodic_forecast_refresh(offset_seconds: int = 5):
+    # Runs right after every full hour, when cached forecasts expire and Open-Meteo
+    # has new model runs; refreshing before that would cache the previous hour's data
+    def run():
+        while True:
+            time.sleep(_forecast_ttl() + offset_seconds)
+            try:
+                refresh_popular_forecasts()
+            except Exception as e:
+                print(f"Forecast refresh error: {e}")
+    t = threading.Thread(target=run, daemon=True)
+    t.start()
+
+
+def _open_meteo_url(latitudes: str, longitudes: str, profile: str):
+    fields = FORECAST_PROFILES[profile]
 
     open_meteo_url = (
-        f"https://api.open-meteo.com/v1/forecast?"
-        f"latitude={lat}&longitude={lon}&current_weather=true&forecast_days={forecast_days}&"
-        f"daily={daily_fields}&"
-        f"hourly={hourly_fields}&"
-        f"timezone=auto"
+        f"{OPEN_METEO_URL}?"
+        f"latitude={latitudes}&longitude={longitudes}&current_weather=true&forecast_days={fields['days']}&"
+        f"daily={','.join(fields['daily'])}&"
     )
+    if fields["hourly"]:
+        open_meteo_url += f"hourly={','.join(fields['hourly'])}&"
+        if "past_hours" in fields:
+            open_meteo_url += f"past_hours={fields['past_hours']}&"
+        if "forecast_hours" in fields:
+            open_meteo_url += f"forecast_hours={fields['forecast_hours']}&"
+    return open_meteo_url + "timezone=auto"
+
 
+def _get_open_meteo(open_meteo_url: str, attempts: int, timeout: int):
     for attempt in range(attempts):
         try:
             resp = requests.get(open_meteo_url, timeout=timeout)
@@ -140,15 +331,33 @@ def fetch_open_meteo(lat: float, lon: float, forecast_days: int = 5, attempts: i
             time.sleep(0.5)
 
 
-from datetime import datetime, timedelta
-from zoneinfo import ZoneInfo
+def fetch_open_meteo(lat: float, lon: float, profile: str = "legacy", attempts: int = 3, timeout: int = 5):
+    return _get_open_meteo(_open_meteo_url(lat, lon, profile), attempts, timeout)
 
 
-def get_timezone_info(timezone_name: str, dt: datetime = None):
-    tz = ZoneInfo(timezone_name)
-    if dt is None:
-        dt = datetime.now(tz)
+def fetch_open_meteo_batch(locations, profile: str = "legacy", attempts: int = 3, timeout: int = 15):
+    # Open-Meteo takes comma separated coordinates and answers with one forecast per location
+    if not locations:
+        return []
+    latitudes = ",".join(str(lat) for lat, lon in locations)
+    longitudes = ",".join(str(lon) for lat, lon in locations)
+    data = _get_open_meteo(_open_meteo_url(latitudes, longitudes, profile), attempts, timeout)
+    if data is None:
+        return None
+    if isinstance(data, dict):
+        data = [data]
+    if len(data) != len(locations):
+        print(f"Open-Meteo batch returned {len(data)} forecasts for {len(locations)} locations")
+        return None
+    return data
 
+
+from datetime import datetime, timedelta, date
+from zoneinfo import ZoneInfo
+from functools import lru_cache
+
+
+def _timezone_info_at(dt: datetime, uses_dst: bool):
     current_offset = dt.utcoffset() or timedelta(0)
     current_gmt_offset = current_offset.total_seconds() / 3600
 
@@ -158,24 +367,82 @@ def get_timezone_info(timezone_name: str, dt: datetime = None):
     standard_offset = current_offset - dst_offset
     standard_gmt_offset = standard_offset.total_seconds() / 3600
 
-    abbreviation = dt.tzname()
-
-    uses_dst = False
-    for month in range(1, 13):
-        test_dt = datetime(dt.year, month, 1, tzinfo=tz)
-        if test_dt.dst() != timedelta(0):
-            uses_dst = True
-            break
-
     return {
         "timeZone": standard_gmt_offset,
         "currentGmtOffset": current_gmt_offset,
-        "timeZoneAbbreviation": abbreviation,
+        "timeZoneAbbreviation": dt.tzname(),
         "is_dst": is_dst,
         "uses_dst": uses_dst
     }
 
 
+@lru_cache(maxsize=1024)
+def _zone_uses_dst(timezone_name: str, year: int) -> bool:
+    tz = ZoneInfo(timezone_name)
+    for month in range(1, 13):
+        test_dt = datetime(year, month, 1, tzinfo=tz)
+        if test_dt.dst() != timedelta(0):
+            return True
+    return False
+
+
+@lru_cache(maxsize=4096)
+def _zone_day(timezone_name: str, day: date):
+    # Timezone metadata for one local day, as (utc_start, info) segments.
+    # There are two segments when a DST transition happens that day.
+    tz = ZoneInfo(timezone_name)
+    uses_dst = _zone_uses_dst(timezone_name, day.year)
+    start = int(datetime(day.year, day.month, day.day, tzinfo=tz).timestamp())
+    end = int((datetime(day.year, day.month, day.day, tzinfo=tz) + timedelta(days=1)).timestamp()) - 1
+
+    def offsets(ts):
+        dt = datetime.fromtimestamp(ts, tz)
+        return dt.utcoffset(), dt.dst(), dt.tzname()
+
+    first = offsets(start)
+    if offsets(end) == first:
+        return ((start, _timezone_info_at(datetime.fromtimestamp(start, tz), uses_dst)),)
+
+    # Binary search for the second at which the offset changes
+    low, high = start, end
+    while high - low > 1:
+        middle = (low + high) // 2
+        if offsets(middle) == first:
+            low = middle
+        else:
+            high = middle
+    return (
+        (start, _timezone_info_at(datetime.fromtimestamp(start, tz), uses_dst)),
+        (high, _timezone_info_at(datetime.fromtimestamp(high, tz), uses_dst))
+    )
+
+
+def get_timezone_info(timezone_name: str, dt: datetime = None):
+    tz = ZoneInfo(timezone_name)
+    if dt is None:
+        dt = datetime.now(tz)
+    elif dt.tzinfo is None:
+        dt = dt.replace(tzinfo=tz)
+    else:
+        dt = dt.astimezone(tz)
+
+    timestamp = dt.timestamp()
+    info = None
+    for segment_start, segment_info in _zone_day(timezone_name, dt.date()):
+        if timestamp >= segment_start or info is None:
+            info = segment_info
+    return dict(info)
+
+
+@lru_cache(maxsize=32)
+def get_moon_phases(start_date: date, days: int = 32):
+    # Shared by every request made on the same day; treat the result as read-only
+    return tuple(
+        {"date": (start_date + timedelta(days=i)).strftime("%m/%d/%Y"), "text": "", "age": (i % 29) + 1}
+        for i in range(days)
+    )
+
+
 def to_12h_format(time_str: str) -> str:
     # expects HH:MM or HH:MM:SS (we'll take first 5 chars)
     s = time_str[:5]
@@ -235,4 +502,58 @@ def convert_speed(speed, metric):
     if not metric:
         return kmh_to_mph(speed)
     else:
-        return speed
\ No newline at end of file
+        return speed
+
+import numpy as np
+
+# Batch versions of the conversions above, for whole daily/hourly columns at once.
+# The lookup tables are generated from the scalar functions so both always agree.
+COMPASS_DIRECTIONS = np.array(["N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE",
+                               "S", "SSW", "SW", "WSW", "W", "WNW", "NW", "NNW"], dtype=object)
+_WMO_CODES = 100
+_CONDITION_ICONS = {
+    is_day: np.array([get_weather_condition(code, is_day)[0] for code in range(_WMO_CODES)])
+    for is_day in (True, False)
+}
+_CONDITION_TEXTS = {
+    is_day: np.array([get_weather_condition(code, is_day)[1] for code in range(_WMO_CODES)], dtype=object)
+    for is_day in (True, False)
+}
+
+
+def weather_conditions(weather_codes, is_day):
+    # Nulls (Open-Meteo pads the tail of some daily columns with them) become NaN here.
+    # They fall back to the same entry as codes outside the WMO table, like the scalar version.
+    codes = np.asarray(weather_codes, dtype=np.float64)
+    known = (codes >= 0) & (codes < _WMO_CODES) & (codes == np.floor(codes))
+    codes = np.where(known, codes, 4).astype(np.int64)
+    return _CONDITION_ICONS[bool(is_day)][codes], _CONDITION_TEXTS[bool(is_day)][codes]
+
+
+def compass_directions(degrees):
+    # Missing directions (null or NaN) have no compass point and are left blank
+    degrees = np.asarray(degrees, dtype=np.float64)
+    missing = np.isnan(degrees)
+    index = np.rint(np.where(missing, 0, degrees) / 22.5).astype(np.int64) % 16
+    return np.where(missing, "", COMPASS_DIRECTIONS[index])
+
+
+def convert_temperatures(temps, metric):
+    temps = np.asarray(temps, dtype=np.float64)
+    if not metric:
+        return temps * 9.0 / 5.0 + 32.0
+    return temps
+
+
+def convert_speeds(speeds, metric):
+    speeds = np.asarray(speeds, dtype=np.float64)
+    if not metric:
+        return speeds * 0.621371
+    return speeds
+
+
+def round_all(values):
+    # Same half-to-even rounding as round(), returned as plain ints for the templates.
+    # Missing values (null or NaN) become 0, like hours missing from a short column.
+    values = np.asarray(values, dtype=np.float64)
+    return np.rint(np.nan_to_num(values, nan=0.0)).astype(np.int64).tolist()
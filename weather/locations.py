@@ -0,0 +1,77 @@
+from config import DATA_DIR, LOCATION_SEED_FILE
+import weather.helpers
+import os
+import threading
+import time
+from store import PersistentStore
+
+LOCATION_INDEX_PATH = os.path.join(DATA_DIR, "locations.db")
+
+# "COUNTRY CODE|CITY" -> {"lat", "lon", "city", "country"}
+_locations = PersistentStore("location_index")
+
+
+def location_key(city_name_short: str, country_code: str):
+    return f"{country_code.strip().upper()}|{city_name_short.strip().upper()}"
+
+
+def load_location_index(path: str = None):
+    return _locations.load(path or LOCATION_INDEX_PATH)
+
+
+def lookup_location(city_name_short: str, country_code: str):
+    key = location_key(city_name_short, country_code)
+    location = _locations.get(key)
+    if location is not None:
+        return location
+
+    nominatim_data = weather.helpers.search_nominatim(city_name_short, country_code)
+    if not nominatim_data:
+        return None
+
+    address = nominatim_data.get("address", {})
+    location = {
+        "lat": float(nominatim_data.get("lat", "0.0")),
+        "lon": float(nominatim_data.get("lon", "0.0")),
+        "city": address.get("city", address.get("town", address.get("village"))),
+        "country": address.get("country")
+    }
+    _locations.set(key, location)
+    return location
+
+
+def read_seed_locations(path: str = LOCATION_SEED_FILE):
+    seeds = []
+    if not os.path.exists(path):
+        return seeds
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                continent, country_code, state_code, city_name_short = line.split("|")
+            except ValueError:
+                print(f"Skipping malformed seed location: {line}")
+                continue
+            seeds.append((city_name_short, country_code))
+    return seeds
+
+
+def prewarm_location_index(seeds=None, interval_seconds: float = 1.0):
+    # Resolves missing seed locations in the background, one Nominatim request per second
+    if seeds is None:
+        seeds = read_seed_locations()
+
+    def run():
+        for city_name_short, country_code in seeds:
+            if location_key(city_name_short, country_code) in _locations:
+                continue
+            try:
+                lookup_location(city_name_short, country_code)
+            except Exception as e:
+                print(f"Location prewarm failed for {city_name_short},{country_code}: {e}")
+            time.sleep(interval_seconds)
+
+    t = threading.Thread(target=run, daemon=True)
+    t.start()
@@ -0,0 +1,218 @@
+import weather.helpers
+from datetime import datetime
+import itertools
+
+_generations = itertools.count(1)
+
+
+class Forecast:
+    # One Open-Meteo payload parsed into per-day and per-hour columns. It is built
+    # once when the payload is fetched and cached together with it, and the
+    # renderer specific projections below are memoized on it, so every endpoint
+    # and unit variant shares a single parse.
+    __slots__ = (
+        "data", "generation", "timezone", "utc_offset_seconds", "current",
+        "dates", "day_names", "sunrise", "sunset", "weathercode",
+        "temp_max", "temp_min", "windspeed", "winddirection", "uv_max",
+        "day_condition", "night_condition", "compass",
+        "hour_times", "hour_temp", "hour_windspeed", "hour_winddirection",
+        "hour_weathercode", "hour_precip",
+        "_projections"
+    )
+
+    def __init__(self, data: dict):
+        self.data = data
+        # Identifies this payload, e.g. in keys of responses rendered from it
+        self.generation = next(_generations)
+        self.timezone = data.get("timezone", "UTC")
+        self.utc_offset_seconds = data.get("utc_offset_seconds", 0)
+        self.current = data.get("current_weather", {})
+
+        daily = data.get("daily", {})
+        self.dates = daily.get("time", [])
+        self.day_names = [datetime.strptime(d, "%Y-%m-%d").strftime("%a") for d in self.dates]
+        self.sunrise = daily.get("sunrise", [])
+        self.sunset = daily.get("sunset", [])
+        self.weathercode = daily.get("weathercode", [])
+        self.temp_max = daily.get("temperature_2m_max", [])
+        self.temp_min = daily.get("temperature_2m_min", [])
+        self.windspeed = daily.get("windspeed_10m_max", [])
+        self.winddirection = daily.get("winddirection_10m_dominant", [])
+        self.uv_max = daily.get("uv_index_max", [])
+        day_icons, day_texts = weather.helpers.weather_conditions(self.weathercode, True)
+        night_icons, night_texts = weather.helpers.weather_conditions(self.weathercode, False)
+        self.day_condition = list(zip(day_icons.tolist(), day_texts.tolist()))
+        self.night_condition = list(zip(night_icons.tolist(), night_texts.tolist()))
+        self.compass = weather.helpers.compass_directions(self.winddirection).tolist()
+
+        # Hourly columns start at local midnight of the current day. Full-day payloads
+        # already do; trimmed ones (see FORECAST_PROFILES) begin up to a day earlier.
+        hourly = data.get("hourly", {})
+        times = hourly.get("time", [])
+        midnight = self.current.get("time", "")[:10] + "T00:00"
+        start = times.index(midnight) if midnight in times else 0
+        self.hour_times = times[start:]
+        self.hour_temp = hourly.get("temperature_2m", [])[start:]
+        self.hour_windspeed = hourly.get("windspeed_10m", [])[start:]
+        self.hour_winddirection = hourly.get("winddirection_10m", [])[start:]
+        self.hour_weathercode = hourly.get("weathercode", [])[start:]
+        self.hour_precip = hourly.get("precipitation", [])[start:]
+
+        self._projections = {}
+
+    def _memoize(self, key, build):
+        value = self._projections.get(key)
+        if value is None:
+            value = build()
+            self._projections[key] = value
+        return value
+
+    # weather.xml
+
+    def legacy_current(self):
+        return self._memoize("legacy_current", self._build_legacy_current)
+
+    def _build_legacy_current(self):
+        current_icon, current_text = weather.helpers.get_weather_condition(
+            self.current.get("weathercode", 0), bool(self.current.get("is_day", 1)))
+        return {
+            "temp": int(self.current.get("temperature", 23)),
+            "condition": {"icon": current_icon, "text": current_text}
+        }
+
+    def legacy_days(self):
+        return self._memoize("legacy_days", self._build_legacy_days)
+
+    def _build_legacy_days(self):
+        days = []
+        for i in range(min(5, len(self.dates))):
+            daily_icon, daily_text = self.day_condition[i]
+            days.append({
+                "name": self.day_names[i],
+                "date": self.dates[i],
+                "condition": {"icon": daily_icon, "text": daily_text},
+                "temp": {"high": int(self.temp_max[i]), "low": int(self.temp_min[i])},
+                "wind": {
+                    "direction": {"degrees": int(self.winddirection[i]), "compass": self.compass[i]},
+                    "speed": int(self.windspeed[i])
+                },
+                "uvi": int(self.uv_max[i])
+            })
+        return days
+
+    # weatherV3.xml
+
+    def planets(self):
+        return self._memoize("planets", self._build_planets)
+
+    def _build_planets(self):
+        sunrise = (self.sunrise or [""])[0][-5:]
+        sunset = (self.sunset or [""])[0][-5:]
+        return {
+            p: {"sunrise": sunrise, "sunset": sunset}
+            for p in ["sun", "moon", "mercury", "venus", "mars", "jupiter", "saturn", "uranus", "neptune", "pluto"]
+        }
+
+    def htc2_days(self, use_metric: bool):
+        return self._memoize(("htc2_days", use_metric), lambda: self._build_htc2_days(use_metric))
+
+    def _build_htc2_days(self, use_metric: bool):
+        n = min(9, len(self.dates))
+        highs = weather.helpers.round_all(weather.helpers.convert_temperatures(self.temp_max[:n], use_metric))
+        lows = weather.helpers.round_all(weather.helpers.convert_temperatures(self.temp_min[:n], use_metric))
+        speeds = weather.helpers.convert_speeds(self.windspeed[:n], use_metric)
+        windspeeds = weather.helpers.round_all(speeds)
+        windgusts = weather.helpers.round_all(speeds * 1.6)  # this is a rough estimation
+        maxuvs = weather.helpers.round_all(self.uv_max[:n])
+
+        forecast_days = []
+        for i in range(n):
+            day_icon, day_text = self.day_condition[i]
+            night_icon, night_text = self.night_condition[i]
+            high = highs[i]
+            low = lows[i]
+            windspeed = windspeeds[i]
+            maxuv = maxuvs[i]
+
+            forecast_days.append({
+                "number": i,
+                "url": "",
+                "obsdate": self.dates[i],
+                "daycode": self.weathercode[i],
+                "sunrise": self.sunrise[i][-5:],
+                "sunset": self.sunset[i][-5:],
+                "day_txtshort": day_text,
+                "day_txtlong": day_text,
+                "day_icon": day_icon,
+                "day_high": high,
+                "day_low": low,
+                "day_realfeelhigh": "",
+                "day_realfeellow": "",
+                "day_windspeed": windspeed,
+                "day_winddirection": self.compass[i],
+                "day_windgust": "",
+                "day_maxuv": maxuv,
+                "day_rain": "0.00",
+                "day_snow": "0.00",
+                "day_ice": "0.00",
+                "day_precip": "0.00",
+                "day_tstormprob": "0",
+                "night_txtshort": night_text,
+                "night_txtlong": night_text,
+                "night_icon": night_icon,
+                "night_high": high,
+                "night_low": low,
+                "night_realfeelhigh": high,
+                "night_realfeellow": low,
+                "night_windspeed": windspeed,
+                "night_winddirection": self.compass[i],
+                "night_windgust": windgusts[i],
+                "night_maxuv": maxuv,
+                "night_rain": "0.00",
+                "night_snow": "0.00",
+                "night_ice": "0.00",
+                "night_precip": "0.00",
+                "night_tstormprob": "0"
+            })
+        return forecast_days
+
+    def htc2_hours(self, use_metric: bool):
+        return self._memoize(("htc2_hours", use_metric), lambda: self._build_htc2_hours(use_metric))
+
+    def _build_htc2_hours(self, use_metric: bool):
+        times = self.hour_times
+        n = min(24, len(times))
+
+        def column(values):
+            # Hours missing from a shorter column are filled with 0
+            values = list(values[:n])
+            return values + [0] * (n - len(values))
+
+        temps = weather.helpers.round_all(weather.helpers.convert_temperatures(column(self.hour_temp), use_metric))
+        precs = column(self.hour_precip)
+        windspeeds = weather.helpers.round_all(weather.helpers.convert_speeds(column(self.hour_windspeed), use_metric))
+        winddirections = weather.helpers.compass_directions(column(self.hour_winddirection)).tolist()
+        if self.hour_weathercode:
+            icons, texts = weather.helpers.weather_conditions(column(self.hour_weathercode), True)
+            icons, texts = icons.tolist(), texts.tolist()
+        else:
+            icons, texts = [0] * n, [""] * n
+
+        forecast_hours = []
+        for i in range(n):
+            forecast_hours.append({
+                "time": times[i][-5:],
+                "icon": icons[i],
+                "temp": temps[i],
+                "realfeel": "",
+                "precip": precs[i],
+                "windspeed": windspeeds[i],
+                "winddirection": winddirections[i],
+                "text": texts[i],
+                "obsdate": times[i][:10],
+                "mobileLink": ""
+            })
+
+        if len(forecast_hours) == 24:
+            forecast_hours = forecast_hours[13:] + forecast_hours[:13]
+        return forecast_hours
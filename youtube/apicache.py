@@ -0,0 +1,48 @@
+from config import DATA_DIR, YOUTUBE_CACHE_SIZE, YOUTUBE_CACHE_STALE
+from config import YOUTUBE_VIDEOS_CACHE_TTL, YOUTUBE_PLAYLIST_CACHE_TTL, YOUTUBE_SEARCH_CACHE_TTL, YOUTUBE_CHANNELS_CACHE_TTL
+from cache import TTLCache
+from store import PersistentStore
+import os
+import time
+
+API_CACHE_PATH = os.path.join(DATA_DIR, "youtube_api.db")
+STALE_SECONDS = YOUTUBE_CACHE_STALE * 60 * 60
+# No response is cached for longer than this, stale window included (in seconds)
+MAX_AGE = max(YOUTUBE_VIDEOS_CACHE_TTL * 60, YOUTUBE_PLAYLIST_CACHE_TTL * 60,
+              YOUTUBE_SEARCH_CACHE_TTL * 60 * 60, YOUTUBE_CHANNELS_CACHE_TTL * 24 * 60 * 60) + STALE_SECONDS
+
+# Request key -> JSON response body. The most recent ones are kept in memory,
+# all of them in the database (as {"body", "expires"}) so they survive restarts.
+_responses = TTLCache(maxsize=YOUTUBE_CACHE_SIZE, ttl=0, stale_ttl=STALE_SECONDS)
+_store = PersistentStore("api_responses")
+
+
+def load_api_cache(path: str = None):
+    _store.open(path or API_CACHE_PATH)
+    prune_api_cache()
+
+
+def prune_api_cache():
+    _store.prune(MAX_AGE)
+
+
+def get_response(key: str):
+    # Returns (body, fresh) like TTLCache.get_entry; body is None when nothing usable is stored
+    body, fresh = _responses.get_entry(key)
+    if body is not None:
+        return body, fresh
+
+    entry = _store.read(key)
+    if entry is None:
+        return None, False
+    body, expires = entry[0]["body"], entry[0]["expires"]
+    now = time.time()
+    if now >= expires + STALE_SECONDS:
+        return None, False
+    _responses.set(key, body, ttl=expires - now)
+    return body, now < expires
+
+
+def store_response(key: str, body: str, ttl: float):
+    _responses.set(key, body, ttl=ttl)
+    _store.write(key, {"body": body, "expires": time.time() + ttl})
@@ -0,0 +1,60 @@
+from config import DATA_DIR, YOUTUBE_CHANNEL_INDEX_TTL
+import youtube.helpers
+import os
+from store import PersistentStore
+
+CHANNEL_INDEX_PATH = os.path.join(DATA_DIR, "channels.db")
+
+# normalized username -> {"channel_id", "uploads"}
+_channels = PersistentStore("channel_index")
+
+
+def username_key(username: str):
+    return " ".join(username.casefold().split())
+
+
+def load_channel_index(path: str = None):
+    return _channels.load(path or CHANNEL_INDEX_PATH)
+
+
+def _resolve(username: str):
+    # One channel search (100 quota units), then the channel itself for its uploads playlist.
+    # The channel is requested with the parts the profile feed uses, so that feed's
+    # channels().list right after is answered from the API cache.
+    search_response = youtube.helpers.yt_api(
+        "search", "list",
+        part="snippet",
+        q=username,
+        type="channel",
+        maxResults=1
+    )
+    if not search_response.get("items"):
+        return None
+    channel_id = search_response["items"][0]["snippet"]["channelId"]
+
+    channel_response = youtube.helpers.yt_api(
+        "channels", "list",
+        part="snippet,statistics,contentDetails",
+        id=channel_id
+    )
+    if not channel_response.get("items"):
+        return None
+    channel = {
+        "channel_id": channel_id,
+        "uploads": channel_response["items"][0]["contentDetails"]["relatedPlaylists"]["uploads"]
+    }
+    _channels.set(username_key(username), channel)
+    return channel
+
+
+def resolve_channel(username: str):
+    # Known usernames are answered from the index, and re-resolved in the background
+    # once older than YOUTUBE_CHANNEL_INDEX_TTL. Returns None when no channel matches.
+    key = username_key(username)
+    channel = _channels.get(key)
+    if channel is None:
+        return _resolve(username)
+
+    if _channels.age(key) > YOUTUBE_CHANNEL_INDEX_TTL * 24 * 60 * 60:
+        _channels.refresh_async(key, lambda: _resolve(username))
+    return channel
@@ -1,4 +1,6 @@
-from config import VIDEO_LIFETIME
+from config import VIDEO_LIFETIME, YOUTUBE_VIDEOS_CACHE_TTL, YOUTUBE_PLAYLIST_CACHE_TTL
+from config import YOUTUBE_SEARCH_CACHE_TTL, YOUTUBE_CHANNELS_CACHE_TTL, YOUTUBE_STATISTICS_CACHE_TTL
+import youtube.apicache
 import requests
 import os
 import random
@@ -8,6 +10,7 @@ import time
 import concurrent.futures
 import threading
 from pathlib import Path
+from urllib.parse import urlencode
 import hashlib
 import json
 from PIL import Image
@@ -25,6 +28,14 @@ _cache_lock = threading.Lock()
 
 _thread_local = threading.local()
 
+# Data API responses are cached for this long per resource (in seconds)
+API_CACHE_TTLS = {
+    "videos": YOUTUBE_VIDEOS_CACHE_TTL * 60,
+    "playlistItems": YOUTUBE_PLAYLIST_CACHE_TTL * 60,
+    "search": YOUTUBE_SEARCH_CACHE_TTL * 60 * 60,
+    "channels": YOUTUBE_CHANNELS_CACHE_TTL * 24 * 60 * 60,
+}
+
 # InnerTube API configuration
 INNERTUBE_API_URL = "https://www.youtube.com/youtubei/v1/player?prettyPrint=false"
 ANDROID_CLIENT_CONTEXT = {
@@ -49,6 +60,48 @@ def yt_client():
         _thread_local.youtube_client = build('youtube', 'v3', developerKey=YOUTUBE_API_KEY)
     return _thread_local.youtube_client
 
+def api_cache_key(resource, method, params):
+    # Parameters that ask for the same data map to the same key: sorted names,
+    # parts in any order, queries in any case and spacing
+    normalized = {}
+    for name, value in params.items():
+        if value is None:
+            continue
+        value = str(value).strip()
+        if name == "part":
+            value = ",".join(sorted(set(p.strip() for p in value.split(","))))
+        elif name == "q":
+            value = " ".join(value.casefold().split())
+        normalized[name] = value
+    return f"{resource}.{method}?{urlencode(sorted(normalized.items()))}"
+
+def api_cache_ttl(resource, params):
+    # Channel searches only resolve channel IDs, which change as rarely as the channels
+    if resource == "search" and params.get("type") == "channel":
+        resource = "channels"
+    ttl = API_CACHE_TTLS.get(resource, API_CACHE_TTLS["videos"])
+    # Counts go stale much sooner than the rest of a channel or video
+    if "statistics" in (part.strip() for part in str(params.get("part", "")).split(",")):
+        ttl = min(ttl, YOUTUBE_STATISTICS_CACHE_TTL * 60)
+    return ttl
+
+def yt_api(resource, method="list", **params):
+    # yt_client().<resource>().<method>(**params).execute() behind a persistent cache.
+    # Every call returns its own copy, so callers may modify the response.
+    key = api_cache_key(resource, method, params)
+    body, fresh = youtube.apicache.get_response(key)
+    if body is not None and fresh:
+        return json.loads(body)
+    try:
+        response = getattr(getattr(yt_client(), resource)(), method)(**params).execute()
+    except Exception as e:
+        if body is None:
+            raise
+        print(f"YouTube API {resource}.{method} failed, serving a stale response: {e}")
+        return json.loads(body)
+    youtube.apicache.store_response(key, json.dumps(response), api_cache_ttl(resource, params))
+    return response
+
 def country_by_ip(ip):
     try:
         from urllib.request import urlopen
@@ -83,6 +136,7 @@ def periodic_cleanup(interval_seconds=3600):
         while True:
             try:
                 cleanup_files()
+                youtube.apicache.prune_api_cache()
             except Exception as e:
                 print(f"Periodic cleanup error: {e}")
             time.sleep(interval_seconds)
@@ -1,5 +1,7 @@
 from config import app, YOUTUBE_API_KEY, CLEANUP_INTERVAL
 from config import HOST, PORT
+import youtube.apicache
+import youtube.channels
 import youtube.helpers
 import os
 from flask import render_template, request, Response, send_from_directory
@@ -35,6 +37,8 @@ with app.app_context():
     if not os.path.exists(youtube.helpers.THUMBNAILS_DIR):
         os.makedirs(youtube.helpers.THUMBNAILS_DIR, exist_ok=True)
     youtube.helpers.cleanup_files()
+    youtube.apicache.load_api_cache()
+    youtube.channels.load_channel_index()
     youtube.helpers.periodic_cleanup(CLEANUP_INTERVAL * 60 * 60)
 
 @app.route("/youtube/accounts/registerDevice", methods=["POST"])
@@ -82,29 +86,30 @@ def related(video_id):
     start_index = int(request.args.get("start-index", "1"))
     max_results = min(int(request.args.get("max-results", "8")), 25)
     try:
-        youtube_client = yt_client()
-        original_video = youtube_client.videos().list(part="snippet", id=video_id).execute()
+        original_video = youtube.helpers.yt_api("videos", "list", part="snippet", id=video_id)
         if not original_video.get("items"):
             return create_empty_related_feed(video_id, start_index)
         video_snippet = original_video["items"][0]["snippet"]
         search_terms = video_snippet["title"]
-        search_response = youtube_client.search().list(
+        search_response = youtube.helpers.yt_api(
+            "search", "list",
             part="snippet",
             q=search_terms,
             type="video",
             maxResults=max_results,
             safeSearch="none",
             order="relevance"
-        ).execute()
+        )
         if not search_response.get("items"):
             return create_empty_related_feed(video_id, start_index)
         video_ids = [item["id"]["videoId"] for item in search_response["items"] if item["id"]["videoId"] != video_id]
         if not video_ids:
             return create_empty_related_feed(video_id, start_index)
-        videos_response = youtube_client.videos().list(
+        videos_response = youtube.helpers.yt_api(
+            "videos", "list",
             part="snippet,contentDetails,statistics,status",
             id=",".join(video_ids[:max_results])
-        ).execute()
+        )
         videos = videos_response.get("items", [])
         processed_videos = []
         host_url = f"http://{HOST}:{PORT}"
@@ -162,25 +167,16 @@ def related(video_id):
 @app.route("/feeds/api/users/<username>")
 def user(username):
     try:
-        youtube_client = yt_client()
-        
-        # Search for channel by name or handle
-        search_response = youtube_client.search().list(
-            part="snippet",
-            q=username,
-            type="channel",
-            maxResults=1
-        ).execute()
-        
-        if not search_response.get("items"):
+        # Channel of a name or handle, from the index once it has been resolved before
+        channel = youtube.channels.resolve_channel(username)
+        if channel is None:
             return create_empty_user_feed(username)
-        
-        channel_id = search_response["items"][0]["snippet"]["channelId"]
 
-        channel_response = youtube_client.channels().list(
+        channel_response = youtube.helpers.yt_api(
+            "channels", "list",
             part="snippet,statistics,contentDetails",
-            id=channel_id
-        ).execute()
+            id=channel["channel_id"]
+        )
         
         if not channel_response.get("items"):
             return create_empty_user_feed(username)
@@ -212,46 +208,30 @@ def uploads(username):
     start_index = int(request.args.get("start-index", "1"))
     max_results = min(int(request.args.get("max-results", "3")), 25)
     try:
-        youtube_client = yt_client()
-        
-        # Search for channel by name or handle
-        search_response = youtube_client.search().list(
-            part="snippet",
-            q=username,
-            type="channel",
-            maxResults=1
-        ).execute()
-        
-        if not search_response.get("items"):
+        # Channel of a name or handle, from the index once it has been resolved before
+        channel = youtube.channels.resolve_channel(username)
+        if channel is None:
             return create_empty_uploads_feed(username, start_index)
+
+        uploads_playlist_id = channel["uploads"]
         
-        channel_id = search_response["items"][0]["snippet"]["channelId"]
-        
-        channel_response = youtube_client.channels().list(
-            part="contentDetails",
-            id=channel_id
-        ).execute()
-        
-        if not channel_response.get("items"):
-            return create_empty_uploads_feed(username, start_index)
-        
-        uploads_playlist_id = channel_response["items"][0]["contentDetails"]["relatedPlaylists"]["uploads"]
-        
-        playlist_response = youtube_client.playlistItems().list(
+        playlist_response = youtube.helpers.yt_api(
+            "playlistItems", "list",
             part="snippet",
             playlistId=uploads_playlist_id,
             maxResults=max_results
-        ).execute()
+        )
         
         if not playlist_response.get("items"):
             return create_empty_uploads_feed(username, start_index)
         
         video_ids = [item["snippet"]["resourceId"]["videoId"] for item in playlist_response["items"]]
         
-        videos_response = youtube_client.videos().list(
+        videos_response = youtube.helpers.yt_api(
+            "videos", "list",
             part="snippet,contentDetails,statistics,status",
             id=",".join(video_ids)
-        ).execute()
+        )
         
         videos = videos_response.get("items", [])
         processed_videos = []
@@ -324,7 +304,6 @@ def search():
     if not query:
         return create_empty_search_feed("", start_index)
     try:
-        youtube_client = yt_client()
         
         # Map orderby parameter to YouTube API order (in case of alternative names)
         order_mapping = {
@@ -335,24 +314,26 @@ def search():
         }
         youtube_order = order_mapping.get(orderby, "relevance")
         
-        search_response = youtube_client.search().list(
+        search_response = youtube.helpers.yt_api(
+            "search", "list",
             part="snippet",
             q=query,
             type="video",
             maxResults=max_results,
             order=youtube_order,
             safeSearch="none"
-        ).execute()
+        )
         
         if not search_response.get("items"):
             return create_empty_search_feed(query, start_index)
         
         video_ids = [item["id"]["videoId"] for item in search_response["items"]]
         
-        videos_response = youtube_client.videos().list(
+        videos_response = youtube.helpers.yt_api(
+            "videos", "list",
             part="snippet,contentDetails,statistics,status",
             id=",".join(video_ids)
-        ).execute()
+        )
         
         videos = videos_response.get("items", [])
         processed_videos = []
@@ -424,13 +405,13 @@ def trending(usercountry):
     startindex = int(request.args.get("start-index", "1"))
     max_results = min(int(request.args.get("max-results", "10")), 25)
     try:
-        youtube_client = yt_client()
-        videos_response = youtube_client.videos().list(
+        videos_response = youtube.helpers.yt_api(
+            "videos", "list",
             part="snippet,contentDetails,statistics,status",
             chart="mostPopular",
             regionCode=usercountry,
             maxResults=max_results
-        ).execute()
+        )
         
         if not videos_response.get("items"):
             print("No videos found in API response")